@@ -1,49 +1,142 @@
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+from app.core.compute_executor import ComputeExecutor, compute_pool_size
+from app.core.config import COMPUTE_WORKERS, ROLLUP_DATE_COLUMN, WEB_CONCURRENCY
+from app.core.profiling import ProfilerBusy, parse_profile_mode, profiled_request
+from app.services.batch_job_store import BatchJobStoreFull
 from app.services.insights_services import InsightsService
+from app.services.rollup_service import RollupService
 from app.db.repository import DatabaseRepository
-from app.api.schemas import InsightsResponse
+from app.api.schemas import InsightsResponse, BatchInsightsRequest, BatchInsightsResponse
 from app.services.auth_service import AuthService
-from contest_insights.contestInsights import generate_business_insights
-from visualization.visualization_mapper import get_visualization_insights
+from visualization.visualization_mapper import transform_trends_to_visualization
+from llm_call.call_llama_get_insight import llm_dispatch_queue
+
+CONTEST_TABLE = "public.contest_summary_table"
+CONTEST_QUERY = f"""
+    SELECT *
+    FROM {CONTEST_TABLE}
+"""
 
 router = APIRouter()
 db_repo = DatabaseRepository()
-service = InsightsService(db_repo)
+rollup_service = RollupService(db_repo, CONTEST_TABLE, ROLLUP_DATE_COLUMN) if ROLLUP_DATE_COLUMN else None
+compute_executor = (
+    ComputeExecutor(compute_pool_size(COMPUTE_WORKERS, WEB_CONCURRENCY)) if COMPUTE_WORKERS > 0 else None
+)
+service = InsightsService(db_repo, rollup_service, compute_executor)
 auth_service = AuthService()
 
+def get_profile_mode(
+    profile: Optional[str] = Query(None, description="Admin only: 'cpu' (or 'true') or 'alloc'"),
+    x_profile: Optional[str] = Header(None),
+    current_user: str = Depends(auth_service.get_current_user),
+):
+    try:
+        mode = parse_profile_mode(profile or x_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if mode and not auth_service.is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Profiling is restricted to admins")
+    return mode
+
+
 @router.get("/insights", response_model=InsightsResponse)
-def get_insights(current_user: str = Depends(auth_service.get_current_user)):
-    query = """
-        SELECT *
-        FROM public.contest_summary_table
-    """
+def get_insights(
+    approximate: bool = Query(False, description="Estimate aggregates from a table sample"),
+    profile_mode: Optional[str] = Depends(get_profile_mode),
+    current_user: str = Depends(auth_service.get_current_user),
+):
     try:
-        insights = service.generate_insights(query)
+        with profiled_request(profile_mode) as profiler:
+            insights = service.generate_insights(CONTEST_QUERY, CONTEST_TABLE if approximate else None)
         if not insights:
             raise HTTPException(status_code=404, detail="No insights generated")
-        return {"insights": insights}
+        return {"insights": insights, "profile": profiler.report() if profiler else None}
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/visualization_insights",response_model=dict)
-def get_visualization_report(current_user: str = Depends(auth_service.get_current_user)):
-    query = """
-        SELECT *
-        FROM public.contest_summary_table
-    """
+def get_visualization_report(
+    approximate: bool = Query(False, description="Estimate aggregates from a table sample"),
+    profile_mode: Optional[str] = Depends(get_profile_mode),
+    current_user: str = Depends(auth_service.get_current_user),
+):
     try:
-        df = db_repo.fetch_data(query)
-        if df.empty:
-            raise HTTPException(status_code=404, detail="No data found")
-        
-        json_for_llm = generate_business_insights(df)
-        visualization_json = get_visualization_insights( json_for_llm)
+        with profiled_request(profile_mode) as profiler:
+            json_for_llm = service.build_aggregates(CONTEST_QUERY, CONTEST_TABLE if approximate else None)
+            if not json_for_llm:
+                raise HTTPException(status_code=404, detail="No data found")
+
+            visualization_json = service.build_visualization(json_for_llm)
         if visualization_json.get("status") != "success":   
             raise HTTPException(status_code=500, detail="Failed to generate visualization config")
         if not isinstance(json_for_llm, dict):
             raise HTTPException(status_code=500, detail="Invalid data format for insights generation")
 
-        return {"visualization": visualization_json, "insights": json_for_llm}
+        response = {"visualization": visualization_json, "insights": json_for_llm}
+        if profiler:
+            response["profile"] = profiler.report()
+        return response
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/insights/batch", response_model=BatchInsightsResponse)
+def get_batch_insights(request: BatchInsightsRequest, current_user: str = Depends(auth_service.get_current_user)):
+    segments = [segment.model_dump() for segment in request.segments]
+    try:
+        if request.run_async:
+            job_id = service.submit_batch_job(CONTEST_QUERY, segments, request.max_concurrency, request.include_llm)
+            return {"status": "queued", "job_id": job_id}
+        results = service.generate_batch_insights(CONTEST_QUERY, segments, request.max_concurrency, request.include_llm)
+        return {"status": "completed", "results": results}
+    except BatchJobStoreFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/insights/batch/{job_id}", response_model=BatchInsightsResponse)
+def get_batch_job(job_id: str, current_user: str = Depends(auth_service.get_current_user)):
+    try:
+        job = service.get_batch_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+
+@router.get("/insights/trends", response_model=dict)
+def get_trends(
+    start: Optional[date] = Query(None, description="First day of the window (default: ROLLUP_TREND_DAYS ago)"),
+    end: Optional[date] = Query(None, description="Last day of the window (default: today)"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    current_user: str = Depends(auth_service.get_current_user),
+):
+    if rollup_service is None:
+        raise HTTPException(status_code=404, detail="Trend rollups are not enabled (set ROLLUP_DATE_COLUMN)")
+    try:
+        trends = rollup_service.get_trends(start, end, granularity)
+        return {"trends": trends, "visualization": transform_trends_to_visualization(trends)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/llm/queue", response_model=dict)
+def get_llm_queue_stats(current_user: str = Depends(auth_service.get_current_user)):
+    if llm_dispatch_queue is None:
+        raise HTTPException(status_code=404, detail="LLM dispatch queue is not enabled (set LLM_QUEUE_ENABLED)")
+    try:
+        return llm_dispatch_queue.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,22 @@
-from pydantic import BaseModel
-from typing import Dict, Any
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
 class InsightsResponse(BaseModel):
     insights: Dict[str, Any]
+    profile: Optional[Dict[str, Any]] = None
+
+class SegmentDefinition(BaseModel):
+    name: str
+    filters: Dict[str, Any] = Field(default_factory=dict)
+
+class BatchInsightsRequest(BaseModel):
+    segments: List[SegmentDefinition] = Field(..., min_length=1, max_length=100)
+    max_concurrency: int = Field(4, ge=1, le=16)
+    include_llm: bool = True
+    run_async: bool = False
+
+class BatchInsightsResponse(BaseModel):
+    status: str
+    job_id: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
@@ -1,14 +1,39 @@
+from anyio import to_thread
 from fastapi import FastAPI
-from app.api.controllers import router
+from app.api.controllers import router, compute_executor, rollup_service
+from app.core.config import THREADPOOL_SIZE
+from app.core.logging_config import logger
 
 class ContestApp:
     def __init__(self):
         self.app = FastAPI(title="Contest Insights API", version="1.0.0")
         self._include_routers()
+        self._register_startup()
+        self._register_shutdown()
 
     def _include_routers(self):
         self.app.include_router(router, prefix="/api", tags=["Insights"])
         self.app.include_router(router, prefix="/api", tags=["visualization_insights"])
 
+    def _register_startup(self):
+        if THREADPOOL_SIZE > 0:
+            self.app.add_event_handler("startup", self._resize_threadpool)
+        if rollup_service is not None:
+            self.app.add_event_handler("startup", rollup_service.start)
+        if compute_executor is not None:
+            self.app.add_event_handler("startup", compute_executor.start)
+
+    @staticmethod
+    async def _resize_threadpool():
+        # Sync endpoints run on AnyIO's default thread limiter
+        to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+        logger.info("✅ Endpoint thread pool sized to %d threads", THREADPOOL_SIZE)
+
+    def _register_shutdown(self):
+        if compute_executor is not None:
+            self.app.add_event_handler("shutdown", compute_executor.shutdown)
+        if rollup_service is not None:
+            self.app.add_event_handler("shutdown", rollup_service.stop)
+
     def get_app(self) -> FastAPI:
         return self.app
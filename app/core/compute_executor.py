@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from app.core.logging_config import logger
+from app.core.profiling import profile_stage
+from app.core.resilience import DeadlineExceeded, current_deadline
+
+
+def compute_pool_size(requested: int, http_workers: int) -> int:
+    """
+    Workers per HTTP worker's pool, capped so that all the pools on the host
+    together (http_workers x pool size) don't exceed the CPU count.
+    """
+    cap = max((os.cpu_count() or 1) // max(http_workers, 1), 1)
+    if requested > cap:
+        logger.warning("⚠️ COMPUTE_WORKERS=%d capped to %d: %d HTTP workers share %s CPUs",
+                       requested, cap, http_workers, os.cpu_count())
+        return cap
+    return requested
+
+
+def _warm_worker():
+    """Import the heavy modules once per worker so tasks start hot."""
+    import pandas  # noqa: F401
+    import contest_insights.contestInsights  # noqa: F401
+    import visualization.visualization_mapper  # noqa: F401
+
+
+def _report_pid() -> int:
+    """No-op task used to spawn and warm every worker at startup."""
+    return os.getpid()
+
+
+def aggregate_snapshot(path: str) -> dict:
+    """Worker task: parse a CSV snapshot and compute the business insights."""
+    import pandas as pd
+    from contest_insights.contestInsights import generate_business_insights
+
+    df = pd.read_csv(path)
+    if df.empty:
+        return {}
+    return generate_business_insights(df)
+
+
+def map_visualization(analytics_data: dict) -> dict:
+    """Worker task: build the visualization config from the insights JSON."""
+    from visualization.visualization_mapper import get_visualization_insights
+
+    return get_visualization_insights(analytics_data)
+
+
+class ComputeExecutor:
+    """
+    Managed process pool for CPU-bound pandas / mapping work.
+
+    Workers are spawned (not forked from a threaded HTTP worker) and warmed
+    with the heavy imports. Inputs travel as snapshot file paths or small
+    dicts, never as DataFrames. Each gunicorn worker starts its own pool
+    after forking, from the app's startup handler (see `start`); total
+    processes are HTTP workers x `max_workers`, so size it with
+    `compute_pool_size`.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+                logger.info("✅ Compute pool started with %d workers", self.max_workers)
+            return self._pool
+
+    def start(self):
+        """
+        Spawn every worker and wait for its warm-up imports, so the first
+        requests don't pay for process start-up inside their deadline.
+        """
+        pool = self._get_pool()
+        # Submitted together, before any finishes, so each one spawns its own worker
+        futures = [pool.submit(_report_pid) for _ in range(self.max_workers)]
+        pids = {future.result() for future in futures}
+        logger.info("✅ Compute pool warmed (%d worker processes)", len(pids))
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args):
+        """
+        Run `func(*args)` in the pool and wait for the result within the
+        current request deadline. When the deadline passes, a task still
+        queued is cancelled; one already running keeps its worker until it
+        finishes and its result is discarded.
+        """
+        deadline = current_deadline()
+        pool = self._get_pool()
+        with profile_stage(f"process_pool:{func.__name__}"):
+            try:
+                future = pool.submit(func, *args)
+                return future.result(timeout=deadline.remaining() if deadline is not None else None)
+            except FutureTimeoutError:
+                # Don't spend an overloaded pool on a request that already gave up
+                future.cancel()
+                raise DeadlineExceeded(f"{func.__name__} did not finish within the request deadline")
+            except BrokenProcessPool:
+                logger.error("❌ Compute pool broke, restarting it on next use")
+                self._reset_pool(pool)
+                raise
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
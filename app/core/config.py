@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,3 +16,46 @@ DB_CONFIG = {
     "host": os.getenv("DB_HOST"),
     "port": os.getenv("DB_PORT"),
 }
+
+# Threads serving sync endpoints per worker (0 keeps the AnyIO default of 40)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "0"))
+
+# Batch insights jobs (state shared by all workers through Postgres)
+BATCH_MAX_ACTIVE_JOBS = int(os.getenv("BATCH_MAX_ACTIVE_JOBS", "20"))
+BATCH_JOB_RETENTION_SECONDS = float(os.getenv("BATCH_JOB_RETENTION_SECONDS", "86400"))
+BATCH_JOB_STALE_SECONDS = float(os.getenv("BATCH_JOB_STALE_SECONDS", "3600"))
+
+# Approximate (fast) aggregation mode
+APPROX_SAMPLE_ROWS = int(os.getenv("APPROX_SAMPLE_ROWS", "100000"))
+
+# Time-bucketed rollups (disabled unless the source table has a timestamp column)
+ROLLUP_DATE_COLUMN = os.getenv("ROLLUP_DATE_COLUMN")
+ROLLUP_TREND_DAYS = int(os.getenv("ROLLUP_TREND_DAYS", "28"))
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "60"))
+ROLLUP_RECOMPUTE_DAYS = int(os.getenv("ROLLUP_RECOMPUTE_DAYS", "7"))
+ROLLUP_REFRESH_TIMEOUT_SECONDS = float(os.getenv("ROLLUP_REFRESH_TIMEOUT_SECONDS", "300"))
+
+# Latency SLO and LLM circuit breaker
+INSIGHTS_DEADLINE_SECONDS = float(os.getenv("INSIGHTS_DEADLINE_SECONDS", "30"))
+# Upper bound for any single LLM HTTP call, also outside a request deadline (batch jobs)
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "60"))
+
+# HTTP worker processes per host (gunicorn reads the same variable)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Process pool for CPU-heavy aggregation / mapping (0 keeps it in the request process),
+# per HTTP worker and capped at cpu_count // WEB_CONCURRENCY
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "0"))
+# Snapshots go to the system temp dir; /dev/shm is faster but only 64MB in a default container
+COMPUTE_SNAPSHOT_DIR = os.getenv("COMPUTE_SNAPSHOT_DIR") or tempfile.gettempdir()
+
+# Shared LLM dispatch queue (one SQLite file used by every worker on the host)
+LLM_QUEUE_ENABLED = os.getenv("LLM_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_QUEUE_PATH = os.getenv("LLM_QUEUE_PATH", os.path.join(tempfile.gettempdir(), "luqta_llm_queue.sqlite3"))
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "60"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0"))
+LLM_DEDUP_TTL_SECONDS = float(os.getenv("LLM_DEDUP_TTL_SECONDS", "30"))
+# Batch calls have no request deadline; this bounds their wait in the queue instead
+LLM_QUEUE_BATCH_MAX_WAIT_SECONDS = float(os.getenv("LLM_QUEUE_BATCH_MAX_WAIT_SECONDS", "600"))
@@ -0,0 +1,199 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PROFILE_MODES = ("cpu", "alloc")
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+MAX_STACK_DEPTH = 64
+TOP_FRAMES = 25
+
+_active_profiler: ContextVar = ContextVar("active_profiler", default=None)
+# tracemalloc is process-wide, so only one request per worker may hold it
+_tracemalloc_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def parse_profile_mode(value):
+    """Map a header / query flag to a profile mode, None when profiling is off."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return None
+    if value in PROFILE_MODES:
+        return value
+    if value in ("1", "true", "yes", "on"):
+        return "cpu"
+    raise ValueError(f"Unsupported profile mode: {value}")
+
+
+def _frame_key(code) -> str:
+    filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{filename}:{code.co_firstlineno} {code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a side thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.cumulative_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_code = self._run.__code__
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                if frame.f_code is not own_code:
+                    stack.append(_frame_key(frame.f_code))
+                frame = frame.f_back
+            if not stack:
+                continue
+            self.samples += 1
+            self.self_counts[stack[0]] += 1
+            self.cumulative_counts.update(set(stack))
+
+    def report(self) -> dict:
+        def top(counts):
+            return [
+                {"frame": frame, "samples": n, "percent": round(n / self.samples * 100, 1)}
+                for frame, n in counts.most_common(TOP_FRAMES)
+            ]
+
+        return {
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "top_self": top(self.self_counts) if self.samples else [],
+            "top_cumulative": top(self.cumulative_counts) if self.samples else [],
+        }
+
+
+class RequestProfiler:
+    """
+    Per-request stage timings, a sampled CPU profile and optional
+    allocation statistics. Only created when a profile is requested.
+
+    Allocation tracing ("alloc") uses tracemalloc, which covers the whole
+    worker process: it slows down and counts every concurrent request in
+    that worker, and only one "alloc" profile may run per worker at a time.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.stages = []
+        self._depth = 0
+        self._started = None
+        self._wall_time = None
+        self._sampler = StackSampler(threading.get_ident())
+        self._allocations = None
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if self.mode == "alloc":
+            if not _tracemalloc_lock.acquire(blocking=False):
+                raise ProfilerBusy("An allocation profile is already running in this worker, retry later")
+            if tracemalloc.is_tracing():
+                _tracemalloc_lock.release()
+                raise ProfilerBusy("tracemalloc is already in use in this worker")
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self):
+        self._sampler.stop()
+        self._wall_time = time.perf_counter() - self._started
+        if self._owns_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _tracemalloc_lock.release()
+            self._allocations = {
+                "scope": "process",
+                "peak_kb": round(peak / 1024, 1),
+                "top": [
+                    {
+                        "location": str(stat.traceback),
+                        "size_kb": round(stat.size / 1024, 1),
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[:TOP_FRAMES]
+                ],
+            }
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = {"name": name, "depth": self._depth, "start_ms": round((time.perf_counter() - self._started) * 1000, 2)}
+        self.stages.append(entry)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self._depth -= 1
+
+    def report(self) -> dict:
+        report = {
+            "mode": self.mode,
+            "wall_time_ms": round(self._wall_time * 1000, 2) if self._wall_time is not None else None,
+            "stages": self.stages,
+            "cpu_profile": self._sampler.report(),
+        }
+        if self._allocations is not None:
+            report["allocations"] = self._allocations
+        return report
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Time a block as a named stage if the current request is being profiled."""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+@contextmanager
+def profiled_request(mode):
+    """
+    Profile everything run in this thread inside the block; no-op when mode
+    is None. Raises ProfilerBusy for "alloc" while another request holds
+    tracemalloc.
+    """
+    if mode is None:
+        yield None
+        return
+    profiler = RequestProfiler(mode)
+    profiler.start()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active_profiler.reset(token)
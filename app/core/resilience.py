@@ -0,0 +1,101 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.core.logging_config import logger
+
+_current_deadline: ContextVar = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitBreakerOpen(Exception):
+    pass
+
+
+class Deadline:
+    """Latency budget for one request, shared by every stage it runs."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def check(self, stage: str):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"{self.seconds:.1f}s budget exhausted before {stage}")
+
+
+def current_deadline():
+    """Deadline of the request running in this context, or None."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Run the block under a deadline; an enclosing, tighter deadline wins."""
+    outer = _current_deadline.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures.
+
+    Once open, calls are rejected until `reset_timeout` has passed, then a
+    single trial call is let through (half-open); its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                logger.info("🔌 Circuit breaker %s half-open, allowing a trial call", self.name)
+                return
+            raise CircuitBreakerOpen(f"Circuit breaker {self.name} is open")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("🔌 Circuit breaker %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+
+    def release_trial(self):
+        """End a call that proved nothing about the dependency (e.g. cut short by the caller)."""
+        with self._lock:
+            if self.state == "half_open":
+                # Back to open with the reset timeout already spent: the next call is the new trial
+                self.state = "open"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("🔌 Circuit breaker %s opened after %d failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
@@ -1,11 +1,13 @@
 import time
 from app.core.logging_config import logger
+from app.core.profiling import profile_stage
 
 def log_time(func):
     def wrapper(*args, **kwargs):
         start = time.time()
         try:
-            return func(*args, **kwargs)
+            with profile_stage(func.__name__):
+                return func(*args, **kwargs)
         finally:
             elapsed = time.time() - start
             logger.info("⏱️ %s took %.3f seconds", func.__name__, elapsed)
@@ -1,28 +1,131 @@
+import os
+import tempfile
 import pandas as pd
+from contextlib import contextmanager
 from io import StringIO
-from psycopg2 import pool
+from psycopg2 import errors, pool, sql
 from app.core.config import DB_CONFIG
 from app.core.logging_config import logger
+from app.core.profiling import profile_stage
+from app.core.resilience import DeadlineExceeded, current_deadline
 from app.core.utils import log_time
 
 
+def _table_identifier(table: str) -> sql.Identifier:
+    return sql.Identifier(*table.split("."))
+
+
 class DatabaseRepository:
     def __init__(self):
         self.connection_pool = pool.SimpleConnectionPool(1, 5, **DB_CONFIG)
         logger.info("✅ Connection pool created successfully")
 
+    def _copy_out(self, query: str, destination):
+        """COPY the query result as CSV with header into a file-like object."""
+        conn = None
+        try:
+            conn = self.connection_pool.getconn()
+            deadline = current_deadline()
+            with profile_stage("db_copy"), conn.cursor() as cur:
+                if deadline is not None:
+                    deadline.check("fetch")
+                    # Let Postgres cancel the COPY once the request budget is spent
+                    cur.execute("SET LOCAL statement_timeout = %s", (max(int(deadline.remaining() * 1000), 1),))
+                try:
+                    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", destination)
+                except errors.QueryCanceled as e:
+                    if deadline is None:
+                        raise
+                    raise DeadlineExceeded(f"fetch cancelled by statement_timeout: {e}")
+        finally:
+            if conn:
+                conn.rollback()
+                self.connection_pool.putconn(conn)
+
+    @log_time
+    def fetch_data(self, query: str) -> pd.DataFrame:
+        buffer = StringIO()
+        self._copy_out(query, buffer)
+        buffer.seek(0)
+        with profile_stage("read_csv"):
+            df = pd.read_csv(buffer)
+        logger.info("📊 Data fetched successfully (%d rows)", len(df))
+        return df
+
     @log_time
-    def fetch_data(self, query: str) -> pd.DataFrame: 
+    def fetch_to_snapshot(self, query: str, directory: str = None) -> str:
+        """
+        Stream the query result straight into a CSV snapshot file and return
+        its path, so another process can parse it without the rows ever being
+        pickled. The caller owns (and must remove) the file.
+        """
+        fd, path = tempfile.mkstemp(prefix="contest_snapshot_", suffix=".csv", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as snapshot:
+                self._copy_out(query, snapshot)
+        except Exception:
+            os.remove(path)
+            raise
+        logger.info("📊 Data snapshot written to %s (%d bytes)", path, os.path.getsize(path))
+        return path
+
+    def fetch_rows(self, query, params=None) -> list:
         conn = None
         try:
             conn = self.connection_pool.getconn()
-            buffer = StringIO()
             with conn.cursor() as cur:
-                cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", buffer)
-            buffer.seek(0)
-            df = pd.read_csv(buffer)
-            logger.info("📊 Data fetched successfully (%d rows)", len(df))
-            return df
+                cur.execute(query, params)
+                return cur.fetchall()
         finally:
             if conn:
+                conn.rollback()
                 self.connection_pool.putconn(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor whose statements commit together or roll back on error."""
+        conn = self.connection_pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.connection_pool.putconn(conn)
+
+    def estimate_row_count(self, table: str) -> int:
+        """Planner estimate of the table size, no scan involved."""
+        rows = self.fetch_rows("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+        return max(int(rows[0][0]), 0) if rows else 0
+
+    @log_time
+    def fetch_sample(self, table: str, percent: float, block_column: str, seed: int = 42) -> pd.DataFrame:
+        """
+        Block-level TABLESAMPLE of roughly `percent`% of the table. Each row
+        carries its heap block number in `block_column`, since rows are
+        sampled a whole block at a time.
+        """
+        query = (
+            f"SELECT (ctid::text::point)[0]::bigint AS {block_column}, * "
+            f"FROM {table} TABLESAMPLE SYSTEM ({float(percent)}) REPEATABLE ({int(seed)})"
+        )
+        return self.fetch_data(query)
+
+    def fetch_distinct_estimates(self, table: str, columns: list) -> dict:
+        """
+        Planner estimates of the distinct values per column from pg_stats,
+        no scan involved. Columns without statistics (table never
+        analyzed) map to None.
+        """
+        rows = self.fetch_rows("""
+            SELECT s.attname,
+                   CASE WHEN s.n_distinct < 0 THEN -s.n_distinct * c.reltuples ELSE s.n_distinct END
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_stats s ON s.schemaname = n.nspname AND s.tablename = c.relname
+            WHERE c.oid = %s::regclass AND s.attname = ANY(%s)
+        """, (table, list(columns)))
+        estimates = {attname: float(n_distinct) for attname, n_distinct in rows}
+        return {column: estimates.get(column) for column in columns}
@@ -6,7 +6,7 @@ from app.core.security import create_access_token, verify_token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 user_db = {
-    "rahul": {"username": "rahul", "password": "rahul@luqtaai#pipeline"}
+    "rahul": {"username": "rahul", "password": "rahul@luqtaai#pipeline", "role": "admin"}
 }
 
 class AuthService:
@@ -31,3 +31,7 @@ class AuthService:
         if username is None:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Unauthorized")
         return username
+
+    def is_admin(self, username: str) -> bool:
+        user = user_db.get(username)
+        return bool(user) and user.get("role") == "admin"
@@ -0,0 +1,139 @@
+import json
+import math
+import numbers
+import time
+from psycopg2 import errors, sql
+from psycopg2.extras import Json
+from app.core.logging_config import logger
+from app.db.repository import DatabaseRepository
+
+JOBS_TABLE = "public.insights_batch_jobs"
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _json_safe(value):
+    """Replace NaN / infinity (which jsonb rejects) with None, recursively."""
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, numbers.Real) and not isinstance(value, numbers.Integral) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _dumps(value) -> str:
+    # Aggregates can carry numpy / timestamp values
+    return json.dumps(_json_safe(value), default=str, allow_nan=False)
+
+
+class BatchJobStoreFull(Exception):
+    pass
+
+
+def _identifier(name: str) -> sql.Identifier:
+    return sql.Identifier(*name.split("."))
+
+
+class BatchJobStore:
+    """
+    Batch job state kept in Postgres so any gunicorn worker can answer a poll,
+    whichever worker accepted (and runs) the job.
+
+    At most `max_active` jobs may be queued or running across all workers.
+    The owning worker refreshes `updated_at` of its active jobs while they
+    make progress; jobs not refreshed for `stale_after` (their worker died)
+    are marked failed, and finished jobs are deleted after `retention`.
+    """
+
+    def __init__(self, db_repo: DatabaseRepository, max_active: int, retention: float, stale_after: float):
+        self.db_repo = db_repo
+        self.max_active = max_active
+        self.retention = retention
+        self.stale_after = stale_after
+        self._schema_ready = False
+
+    def _ensure_schema(self, cur):
+        if self._schema_ready:
+            return
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {jobs} (
+                job_id text PRIMARY KEY,
+                status text NOT NULL,
+                submitted_at double precision NOT NULL,
+                updated_at double precision NOT NULL,
+                finished_at double precision,
+                results jsonb,
+                error text
+            );
+            CREATE INDEX IF NOT EXISTS insights_batch_jobs_by_status ON {jobs} (status, updated_at);
+        """).format(jobs=_identifier(JOBS_TABLE)))
+        self._schema_ready = True
+
+    def create(self, job_id: str):
+        """Register a queued job, raising BatchJobStoreFull when the active limit is reached."""
+        now = time.time()
+        jobs = _identifier(JOBS_TABLE)
+        with self.db_repo.transaction() as cur:
+            # Serialises schema creation and the capacity check across workers
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (JOBS_TABLE,))
+            self._ensure_schema(cur)
+            cur.execute(
+                sql.SQL("UPDATE {} SET status = 'failed', error = %s, finished_at = %s, updated_at = %s "
+                        "WHERE status IN %s AND updated_at < %s").format(jobs),
+                ("Job abandoned by its worker", now, now, ACTIVE_STATUSES, now - self.stale_after),
+            )
+            cur.execute(sql.SQL("DELETE FROM {} WHERE finished_at < %s").format(jobs), (now - self.retention,))
+            cur.execute(sql.SQL("SELECT COUNT(*) FROM {} WHERE status IN %s").format(jobs), (ACTIVE_STATUSES,))
+            active = cur.fetchone()[0]
+            if active >= self.max_active:
+                logger.warning("⚠️ Batch job rejected, %d jobs already active", active)
+                raise BatchJobStoreFull(f"{active} batch jobs already queued or running, retry later")
+            cur.execute(
+                sql.SQL("INSERT INTO {} (job_id, status, submitted_at, updated_at) VALUES (%s, 'queued', %s, %s)")
+                .format(jobs),
+                (job_id, now, now),
+            )
+
+    def update(self, job_id: str, status: str, results: list = None, error: str = None):
+        now = time.time()
+        finished_at = None if status in ACTIVE_STATUSES else now
+        with self.db_repo.transaction() as cur:
+            cur.execute(
+                sql.SQL("UPDATE {} SET status = %s, results = %s, error = %s, finished_at = %s, updated_at = %s "
+                        "WHERE job_id = %s").format(_identifier(JOBS_TABLE)),
+                (status, Json(results, dumps=_dumps) if results is not None else None, error, finished_at, now, job_id),
+            )
+
+    def touch(self, job_ids):
+        """Refresh `updated_at` of still-active jobs so they are not taken for abandoned."""
+        if not job_ids:
+            return
+        with self.db_repo.transaction() as cur:
+            cur.execute(
+                sql.SQL("UPDATE {} SET updated_at = %s WHERE job_id = ANY(%s) AND status IN %s")
+                .format(_identifier(JOBS_TABLE)),
+                (time.time(), list(job_ids), ACTIVE_STATUSES),
+            )
+
+    def get(self, job_id: str):
+        try:
+            rows = self.db_repo.fetch_rows(
+                sql.SQL("SELECT job_id, status, submitted_at, finished_at, results, error FROM {} WHERE job_id = %s")
+                .format(_identifier(JOBS_TABLE)),
+                (job_id,),
+            )
+        except errors.UndefinedTable:
+            # No job was ever submitted on this database
+            return None
+        if not rows:
+            return None
+        job_id, status, submitted_at, finished_at, results, error = rows[0]
+        job = {"job_id": job_id, "status": status, "submitted_at": submitted_at}
+        if finished_at is not None:
+            job["finished_at"] = finished_at
+        if results is not None:
+            job["results"] = results
+        if error is not None:
+            job["error"] = error
+        return job
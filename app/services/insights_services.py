@@ -1,27 +1,284 @@
-from contest_insights.contestInsights import generate_business_insights
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contest_insights.contestInsights import (
+    filter_segment,
+    generate_business_insights,
+    prepare_contest_frame,
+)
+from contest_insights.approximateInsights import BLOCK_COLUMN, generate_approximate_insights, sample_percent
+from contest_insights.ruleBasedInsights import generate_rule_based_insights
 from llm_call.call_llama_get_insight import get_insights_from_llm
+from visualization.visualization_mapper import get_visualization_insights
+from app.core.compute_executor import ComputeExecutor, aggregate_snapshot, map_visualization
+from app.core.config import (
+    APPROX_SAMPLE_ROWS,
+    BATCH_JOB_RETENTION_SECONDS,
+    BATCH_JOB_STALE_SECONDS,
+    BATCH_MAX_ACTIVE_JOBS,
+    COMPUTE_SNAPSHOT_DIR,
+    INSIGHTS_DEADLINE_SECONDS,
+)
 from app.core.logging_config import logger
+from app.core.profiling import profile_stage
+from app.core.resilience import CircuitBreakerOpen, DeadlineExceeded, request_deadline
 from app.core.utils import log_time
 from app.db.repository import DatabaseRepository
+from app.services.batch_job_store import BatchJobStore
+from app.services.rollup_service import RollupService
+
+# LLM insights kept per data version as the degraded-mode fallback
+MAX_CACHED_INSIGHTS = 32
+# Minimum interval between updated_at refreshes of this worker's batch jobs
+BATCH_HEARTBEAT_SECONDS = 30
+
+
+def compute_data_version(json_for_llm: dict) -> str:
+    """Stable hash of the aggregates, ignoring the time-relative trends."""
+    versioned = {k: v for k, v in json_for_llm.items() if k != "trends"}
+    return hashlib.sha256(json.dumps(versioned, sort_keys=True, default=str).encode()).hexdigest()[:16]
 
 
 class InsightsService:
-    def __init__(self, db_repo: DatabaseRepository):
+    def __init__(self, db_repo: DatabaseRepository, rollup_service: RollupService = None,
+                 compute_executor: ComputeExecutor = None):
         self.db_repo = db_repo
+        self.rollup_service = rollup_service
+        self.compute_executor = compute_executor
+        self.batch_jobs = BatchJobStore(db_repo, BATCH_MAX_ACTIVE_JOBS, BATCH_JOB_RETENTION_SECONDS, BATCH_JOB_STALE_SECONDS)
+        self._job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-insights")
+        self._active_jobs = set()
+        self._jobs_lock = threading.Lock()
+        self._last_heartbeat = 0.0
+        self._insights_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     @log_time
-    def generate_insights(self, query: str):
+    def generate_insights(self, query: str, sample_table: str = None):
+        """
+        Aggregate and ask the LLM for insights within INSIGHTS_DEADLINE_SECONDS.
+
+        If the deadline is spent, the LLM circuit breaker is open or the LLM
+        call fails, the last cached insights for the same data version (or
+        rule-based recommendations from the aggregates) are returned instead,
+        marked with a "degraded" entry.
+        """
+        with request_deadline(INSIGHTS_DEADLINE_SECONDS) as deadline:
+            try:
+                json_for_llm = self.build_aggregates(query, sample_table)
+            except DeadlineExceeded as e:
+                return self._degraded_insights(None, None, str(e))
+            if not json_for_llm:
+                return {}
+
+            data_version = compute_data_version(json_for_llm)
+            try:
+                deadline.check("LLM call")
+                insights = get_insights_from_llm(json_for_llm)
+            except (DeadlineExceeded, CircuitBreakerOpen, RuntimeError) as e:
+                insights = self._degraded_insights(json_for_llm, data_version, str(e))
+            else:
+                if insights:
+                    self._cache_insights(data_version, insights)
+                logger.info("✅ Insights generated successfully")
+
+        if "approximation" in json_for_llm:
+            insights["approximation"] = json_for_llm["approximation"]
+        return insights
+
+    def _cache_insights(self, data_version: str, insights: dict):
+        with self._cache_lock:
+            self._insights_cache[data_version] = copy.deepcopy(insights)
+            self._insights_cache.move_to_end(data_version)
+            while len(self._insights_cache) > MAX_CACHED_INSIGHTS:
+                self._insights_cache.popitem(last=False)
+
+    def _degraded_insights(self, json_for_llm, data_version, reason: str) -> dict:
+        logger.warning("⚠️ Serving degraded insights: %s", reason)
+        with self._cache_lock:
+            cached = self._insights_cache.get(data_version) if data_version else None
+            latest_version = next(reversed(self._insights_cache), None)
+
+        if cached is not None:
+            insights, source = copy.deepcopy(cached), "cache"
+        elif json_for_llm:
+            insights, source = generate_rule_based_insights(json_for_llm), "rules"
+        elif latest_version is not None:
+            # Aggregates unavailable: the newest cached insights, possibly for older data
+            with self._cache_lock:
+                insights = copy.deepcopy(self._insights_cache.get(latest_version, {}))
+            source, data_version = "stale_cache", latest_version
+        else:
+            raise DeadlineExceeded(reason)
+
+        insights["degraded"] = {"reason": reason, "source": source, "data_version": data_version}
+        return insights
+
+    def build_aggregates(self, query: str, sample_table: str = None) -> dict:
+        """
+        Aggregate the contest data for the LLM / visualization.
+
+        With `sample_table` set, the opt-in approximate mode is used: the
+        aggregates are estimated from a sample of that table instead of
+        running `query` over every row.
+        """
+        if sample_table:
+            json_for_llm = self.generate_approximate_aggregates(sample_table)
+        else:
+            json_for_llm = self._exact_aggregates(query)
+
+        if json_for_llm and self.rollup_service:
+            try:
+                json_for_llm["trends"] = self.rollup_service.get_trends(granularity="week")
+            except Exception as e:
+                logger.warning("⚠️ Trend rollups unavailable: %s", e)
+        return json_for_llm
+
+    def _exact_aggregates(self, query: str) -> dict:
+        if self.compute_executor is not None:
+            return self._aggregate_in_pool(query)
+
         df = self.db_repo.fetch_data(query)
 
         if df.empty:
             logger.warning("⚠️ Query returned no data")
             return {}
 
-        json_for_llm = generate_business_insights(df)
+        with profile_stage("aggregation"):
+            json_for_llm = generate_business_insights(df)
         if not isinstance(json_for_llm, dict):
             logger.error("❌ generate_business_insights returned invalid JSON")
             return {}
+        return json_for_llm
 
-        insights = get_insights_from_llm(json_for_llm)
-        logger.info("✅ Insights generated successfully")
-        return insights
+    def _aggregate_in_pool(self, query: str) -> dict:
+        # The COPY output goes straight to a snapshot file the worker parses itself
+        path = self.db_repo.fetch_to_snapshot(query, COMPUTE_SNAPSHOT_DIR)
+        try:
+            json_for_llm = self.compute_executor.run(aggregate_snapshot, path)
+        finally:
+            os.remove(path)
+        if not json_for_llm:
+            logger.warning("⚠️ Query returned no data")
+        return json_for_llm
+
+    def build_visualization(self, json_for_llm: dict) -> dict:
+        if self.compute_executor is not None:
+            return self.compute_executor.run(map_visualization, json_for_llm)
+        with profile_stage("visualization_mapping"):
+            return get_visualization_insights(json_for_llm)
+
+    @log_time
+    def generate_approximate_aggregates(self, table: str) -> dict:
+        estimated_rows = self.db_repo.estimate_row_count(table)
+        percent = sample_percent(estimated_rows, APPROX_SAMPLE_ROWS)
+        if percent >= 100:
+            logger.info("ℹ️ Table small enough for exact aggregation (%d rows)", estimated_rows)
+            return self._exact_aggregates(f"SELECT * FROM {table}")
+
+        df = self.db_repo.fetch_sample(table, percent, BLOCK_COLUMN)
+        if df.empty:
+            logger.warning("⚠️ Table sample returned no data")
+            return {}
+
+        distinct_columns = {"total_clients": "Client_Name", "total_contests": "id"}
+        estimates = self.db_repo.fetch_distinct_estimates(table, list(distinct_columns.values()))
+        distinct_counts = {key: estimates[column] for key, column in distinct_columns.items()}
+        with profile_stage("aggregation"):
+            return generate_approximate_insights(df, estimated_rows, distinct_counts)
+
+    @log_time
+    def generate_batch_insights(self, query: str, segments: list, max_concurrency: int = 4, include_llm: bool = True,
+                                progress=None) -> list:
+        """
+        Evaluate many segments against a single fetch of the table.
+
+        Aggregates are computed per segment from the shared dataframe, then
+        the LLM calls are dispatched with at most `max_concurrency` in flight.
+        `progress`, if given, is called after every segment and LLM result.
+        """
+        progress = progress or (lambda: None)
+        df = self.db_repo.fetch_data(query)
+        prepare_contest_frame(df)
+
+        results = []
+        for segment in segments:
+            result = {"segment": segment["name"], "filters": segment.get("filters", {})}
+            try:
+                segment_df = filter_segment(df, segment.get("filters", {}))
+                if segment_df.empty:
+                    result.update(status="empty", aggregates={}, insights={})
+                else:
+                    result.update(status="success", aggregates=generate_business_insights(segment_df))
+            except Exception as e:
+                logger.error("❌ Segment %s aggregation failed: %s", segment["name"], e)
+                result.update(status="error", error=str(e))
+            results.append(result)
+            progress()
+
+        pending = [r for r in results if r["status"] == "success"]
+        if include_llm and pending:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending))) as executor:
+                futures = [(r, executor.submit(get_insights_from_llm, r["aggregates"], "batch")) for r in pending]
+                for result, future in futures:
+                    try:
+                        result["insights"] = future.result()
+                    except Exception as e:
+                        logger.error("❌ Segment %s LLM call failed: %s", result["segment"], e)
+                        result.update(status="error", error=str(e))
+                    progress()
+
+        logger.info("✅ Batch insights generated for %d segments", len(results))
+        return results
+
+    def submit_batch_job(self, query: str, segments: list, max_concurrency: int = 4, include_llm: bool = True) -> str:
+        """
+        Queue a batch job on this worker and return its id. The job state is
+        stored in Postgres so the id can be polled through any worker;
+        raises BatchJobStoreFull when too many jobs are already active.
+        """
+        job_id = uuid.uuid4().hex
+        self.batch_jobs.create(job_id)
+        with self._jobs_lock:
+            self._active_jobs.add(job_id)
+        self._job_executor.submit(self._run_batch_job, job_id, query, segments, max_concurrency, include_llm)
+        return job_id
+
+    def get_batch_job(self, job_id: str):
+        return self.batch_jobs.get(job_id)
+
+    def _heartbeat_batch_jobs(self):
+        # Jobs still queued behind the running ones are refreshed too, so only
+        # the jobs of a dead worker go stale
+        now = time.monotonic()
+        with self._jobs_lock:
+            if now - self._last_heartbeat < BATCH_HEARTBEAT_SECONDS:
+                return
+            self._last_heartbeat = now
+            job_ids = list(self._active_jobs)
+        try:
+            self.batch_jobs.touch(job_ids)
+        except Exception as e:
+            logger.warning("⚠️ Could not refresh batch jobs: %s", e)
+
+    def _run_batch_job(self, job_id: str, query: str, segments: list, max_concurrency: int, include_llm: bool):
+        try:
+            self.batch_jobs.update(job_id, "running")
+            results = self.generate_batch_insights(query, segments, max_concurrency, include_llm,
+                                                   progress=self._heartbeat_batch_jobs)
+            self.batch_jobs.update(job_id, "completed", results=results)
+        except Exception as e:
+            logger.error("❌ Batch job %s failed: %s", job_id, e)
+            try:
+                self.batch_jobs.update(job_id, "failed", error=str(e))
+            except Exception as store_error:
+                logger.error("❌ Could not record failure of batch job %s: %s", job_id, store_error)
+        finally:
+            with self._jobs_lock:
+                self._active_jobs.discard(job_id)
@@ -0,0 +1,231 @@
+import threading
+from datetime import date, datetime, timedelta
+from psycopg2 import sql
+from contest_insights.trendInsights import ROLLUP_COLUMNS, build_trend_insights
+from app.core.config import (
+    ROLLUP_RECOMPUTE_DAYS,
+    ROLLUP_REFRESH_SECONDS,
+    ROLLUP_REFRESH_TIMEOUT_SECONDS,
+    ROLLUP_TREND_DAYS,
+)
+from app.core.logging_config import logger
+from app.core.utils import log_time
+from app.db.repository import DatabaseRepository
+
+ROLLUP_TABLE = "public.contest_daily_rollups"
+STATE_TABLE = "public.contest_rollup_state"
+GRANULARITIES = ("day", "week")
+
+# Per-bucket aggregates of the source rows, in ROLLUP_COLUMNS order
+BUCKET_AGGREGATES = """
+    SELECT {col}::date,
+           COALESCE("Client_Name", 'Unknown'),
+           COALESCE(SUM("Total_Views"), 0),
+           COALESCE(SUM("Total_Joins"), 0),
+           COALESCE(SUM("Clicks"), 0),
+           COALESCE(SUM("Number_of_Winners"), 0),
+           COALESCE(SUM("Completion_Rate"), 0),
+           COUNT("Completion_Rate"),
+           COUNT(*)
+    FROM {src}
+"""
+
+
+def _identifier(name: str) -> sql.Identifier:
+    return sql.Identifier(*name.split("."))
+
+
+class RollupService:
+    """
+    Maintains daily per-client aggregates of the contest table.
+
+    Each refresh folds rows newer than the stored watermark into the daily
+    buckets and fully recomputes the last `ROLLUP_RECOMPUTE_DAYS` days, so
+    counters updated in place and rows committed late are picked up as long
+    as they fall inside that window. Older buckets are never revisited.
+    Refreshes run on a background thread, never inside a request; any date
+    window at day or week granularity is answered by summing buckets.
+    """
+
+    def __init__(self, db_repo: DatabaseRepository, source_table: str, date_column: str):
+        self.db_repo = db_repo
+        self.source_table = source_table
+        self.date_column = date_column
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._schema_ready = False
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        # Its own short transaction: the lock only keeps the CREATEs of workers
+        # starting together from colliding, not refreshes from running
+        with self.db_repo.transaction() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (ROLLUP_TABLE,))
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {rollups} (
+                    bucket_date date NOT NULL,
+                    client_name text NOT NULL,
+                    views bigint NOT NULL DEFAULT 0,
+                    joins bigint NOT NULL DEFAULT 0,
+                    clicks bigint NOT NULL DEFAULT 0,
+                    winners bigint NOT NULL DEFAULT 0,
+                    completion_sum double precision NOT NULL DEFAULT 0,
+                    completion_count bigint NOT NULL DEFAULT 0,
+                    row_count bigint NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket_date, client_name)
+                );
+                CREATE TABLE IF NOT EXISTS {state} (
+                    source text PRIMARY KEY,
+                    watermark timestamp,
+                    refreshed_at timestamptz
+                );
+            """).format(rollups=_identifier(ROLLUP_TABLE), state=_identifier(STATE_TABLE)))
+        self._schema_ready = True
+
+    # ----------------------------
+    # Background refresh
+    # ----------------------------
+    def start(self):
+        """Start the refresh thread of this worker (idempotent)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="rollup-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=ROLLUP_REFRESH_TIMEOUT_SECONDS)
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("❌ Rollup refresh failed: %s", e)
+            self._stop.wait(ROLLUP_REFRESH_SECONDS)
+
+    @log_time
+    def refresh(self, force: bool = False) -> int:
+        """
+        Fold new rows into the daily buckets and recompute the trailing
+        ROLLUP_RECOMPUTE_DAYS days.
+
+        Refreshes are throttled across workers to ROLLUP_REFRESH_SECONDS
+        (unless `force`), a refresh already running in another worker is
+        skipped rather than waited on, and each run is bounded by
+        ROLLUP_REFRESH_TIMEOUT_SECONDS. Returns the number of buckets
+        written.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._ensure_schema()
+            with self.db_repo.transaction() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(ROLLUP_REFRESH_TIMEOUT_SECONDS * 1000),))
+                source_key = f"{self.source_table}.{self.date_column}"
+                cur.execute(
+                    sql.SQL("INSERT INTO {} (source, watermark) VALUES (%s, NULL) ON CONFLICT DO NOTHING")
+                    .format(_identifier(STATE_TABLE)),
+                    (source_key,),
+                )
+                cur.execute(
+                    sql.SQL("SELECT watermark, refreshed_at > now() - make_interval(secs => %s) "
+                            "FROM {} WHERE source = %s FOR UPDATE SKIP LOCKED")
+                    .format(_identifier(STATE_TABLE)),
+                    (ROLLUP_REFRESH_SECONDS, source_key),
+                )
+                locked = cur.fetchone()
+                if locked is None:
+                    logger.info("ℹ️ Rollup refresh already running in another worker")
+                    return 0
+                watermark, recently_refreshed = locked
+                if recently_refreshed and not force:
+                    return 0
+
+                return self._fold(cur, watermark, source_key)
+        finally:
+            self._refresh_lock.release()
+
+    def _fold(self, cur, watermark, source_key: str) -> int:
+        date_column = sql.Identifier(self.date_column)
+        source = _identifier(self.source_table)
+        rollups = _identifier(ROLLUP_TABLE)
+        state = _identifier(STATE_TABLE)
+
+        cur.execute(sql.SQL("SELECT MAX({col}) FROM {src}").format(col=date_column, src=source))
+        latest = cur.fetchone()[0]
+        if latest is None:
+            cur.execute(sql.SQL("UPDATE {} SET refreshed_at = now() WHERE source = %s").format(state), (source_key,))
+            return 0
+        latest_day = latest.date() if isinstance(latest, datetime) else latest
+        recompute_from = latest_day - timedelta(days=ROLLUP_RECOMPUTE_DAYS - 1)
+        aggregates = sql.SQL(BUCKET_AGGREGATES).format(col=date_column, src=source)
+
+        # New rows older than the recompute window are only ever added once
+        cur.execute(sql.SQL("""
+            INSERT INTO {rollups} AS r
+                (bucket_date, client_name, views, joins, clicks, winners,
+                 completion_sum, completion_count, row_count)
+            {aggregates}
+            WHERE {col} > COALESCE(%s, '-infinity'::timestamp) AND {col} < %s
+            GROUP BY 1, 2
+            ON CONFLICT (bucket_date, client_name) DO UPDATE SET
+                views = r.views + EXCLUDED.views,
+                joins = r.joins + EXCLUDED.joins,
+                clicks = r.clicks + EXCLUDED.clicks,
+                winners = r.winners + EXCLUDED.winners,
+                completion_sum = r.completion_sum + EXCLUDED.completion_sum,
+                completion_count = r.completion_count + EXCLUDED.completion_count,
+                row_count = r.row_count + EXCLUDED.row_count
+        """).format(rollups=rollups, aggregates=aggregates, col=date_column), (watermark, recompute_from))
+        folded = cur.rowcount
+
+        # The trailing window is rebuilt from scratch to catch in-place updates and late rows
+        cur.execute(sql.SQL("DELETE FROM {} WHERE bucket_date >= %s").format(rollups), (recompute_from,))
+        cur.execute(sql.SQL("""
+            INSERT INTO {rollups}
+                (bucket_date, client_name, views, joins, clicks, winners,
+                 completion_sum, completion_count, row_count)
+            {aggregates}
+            WHERE {col} >= %s AND {col} <= %s
+            GROUP BY 1, 2
+        """).format(rollups=rollups, aggregates=aggregates, col=date_column), (recompute_from, latest))
+        recomputed = cur.rowcount
+
+        cur.execute(
+            sql.SQL("UPDATE {} SET watermark = %s, refreshed_at = now() WHERE source = %s").format(state),
+            (latest, source_key),
+        )
+        logger.info("📈 Rollups: %d buckets folded, %d recomputed since %s", folded, recomputed, recompute_from)
+        return folded + recomputed
+
+    def fetch_buckets(self, start: date, end: date, granularity: str = "day") -> list:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        query = sql.SQL("""
+            SELECT date_trunc(%s, bucket_date)::date AS bucket, client_name,
+                   {sums}
+            FROM {rollups}
+            WHERE bucket_date >= %s AND bucket_date <= %s
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """).format(
+            sums=sql.SQL(", ").join(sql.SQL("SUM({0})").format(sql.Identifier(c)) for c in ROLLUP_COLUMNS),
+            rollups=_identifier(ROLLUP_TABLE),
+        )
+        return self.db_repo.fetch_rows(query, (granularity, start, end))
+
+    @log_time
+    def get_trends(self, start: date = None, end: date = None, granularity: str = "day") -> dict:
+        """Trends from the stored buckets; never refreshes them in the request."""
+        end = end or date.today()
+        start = start or end - timedelta(days=ROLLUP_TREND_DAYS - 1)
+        if start > end:
+            raise ValueError("start must not be after end")
+        rows = self.fetch_buckets(start, end, granularity)
+        return build_trend_insights(rows, granularity, start, end)
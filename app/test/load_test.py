@@ -0,0 +1,378 @@
+"""
+Load-test harness for the Contest Insights API.
+
+Replays a weighted request mix (recorded JSONL or the built-in synthetic mix)
+at a fixed concurrency and reports throughput plus p50/p95/p99 latency per
+endpoint. It can seed synthetic contest rows into a separate database on a
+local Postgres (contest_load_test unless --db-name is given), run a stub LLM
+server with configurable latency, and spawn the app against both.
+
+Example:
+    python app/test/load_test.py --seed-rows 50000 --spawn-app --server gunicorn --workers 4 \\
+        --threadpool-size 40 --llm-latency 1.5 --concurrency 16 --duration 60
+
+With --server gunicorn the app runs as in production (gunicorn with
+UvicornWorker); --server uvicorn uses uvicorn's own process manager.
+
+Traffic file format (one JSON object per line):
+    {"method": "GET", "path": "/insights", "weight": 3}
+    {"method": "POST", "path": "/api/insights/batch", "json": {...}, "weight": 1}
+    {"method": "GET", "path": "/health", "auth": false, "weight": 5}
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USERNAME = "rahul"
+PASSWORD = "rahul@luqtaai#pipeline"
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LOCAL_DB_HOSTS = {"localhost", "127.0.0.1", "::1"}
+# Seeded data goes to its own database, never the one the app normally serves
+LOAD_TEST_DB_NAME = "contest_load_test"
+
+DEFAULT_MIX = [
+    {"method": "GET", "path": "/health", "auth": False, "weight": 4},
+    {"method": "POST", "path": "/auth/token", "auth": False, "weight": 1},
+    {"method": "GET", "path": "/insights", "weight": 2},
+    {"method": "GET", "path": "/visualization_insights", "weight": 3},
+]
+
+STUB_INSIGHTS = {
+    "overall_recommendations": {
+        "roi_improvements": ["Increase reward distribution by 15%"],
+        "feature_suggestions": ["Add a 2 week streak bonus"],
+        "engagement_strategies": ["Send reminders 3 days before close"],
+        "reward_and_incentive_tips": ["Raise winner count by 10%"],
+    },
+    "client_recommendations": [],
+    "campaign_level_recommendations": [],
+}
+
+
+# ----------------------------
+# Local Postgres seeding
+# ----------------------------
+def _connect(dbname: str):
+    import psycopg2
+
+    return psycopg2.connect(
+        dbname=dbname, user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
+    )
+
+
+def ensure_database(dbname: str):
+    from psycopg2 import sql
+
+    conn = _connect(os.getenv("DB_NAME"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (dbname,))
+            if cur.fetchone() is None:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(dbname)))
+                print(f"Created database {dbname}")
+    finally:
+        conn.close()
+
+
+def seed_database(rows: int, seed: int, dbname: str, force: bool = False):
+    """Recreate public.contest_summary_table in `dbname` (created if missing) with synthetic rows."""
+    host = os.getenv("DB_HOST")
+    if host not in LOCAL_DB_HOSTS and not force:
+        raise SystemExit(f"Refusing to seed non-local database host {host!r} (use --force)")
+    if dbname == os.getenv("DB_NAME") and not force:
+        raise SystemExit(f"Refusing to drop contest_summary_table in the app database {dbname!r} (use --force)")
+
+    rng = random.Random(seed)
+    clients = [f"Client {i}" for i in range(1, 26)]
+    genders = ["male", "female", "other"]
+    ages = ["18-24", "25-34", "35-44", "45-54", "55+"]
+    statuses = ["Rewarded", "Not Rewarded"]
+    start = datetime(2025, 1, 1)
+
+    buffer = io.StringIO()
+    for _ in range(rows):
+        views = rng.randint(0, 5000)
+        clicks = rng.randint(0, views)
+        joins = rng.randint(0, clicks)
+        seconds = rng.randint(5, 900)
+        buffer.write(",".join([
+            str(rng.randint(1, max(rows // 4, 1))),
+            rng.choice(clients),
+            rng.choice(genders),
+            rng.choice(ages),
+            rng.choice(statuses),
+            str(views),
+            str(joins),
+            str(clicks),
+            f"{rng.uniform(0, 100):.2f}",
+            str(timedelta(seconds=seconds)),
+            str(rng.randint(0, 20)),
+            (start + timedelta(minutes=rng.randint(0, 365 * 24 * 60))).isoformat(),
+        ]) + "\n")
+    buffer.seek(0)
+
+    if dbname != os.getenv("DB_NAME"):
+        ensure_database(dbname)
+    conn = _connect(dbname)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS public.contest_summary_table")
+            cur.execute("""
+                CREATE TABLE public.contest_summary_table (
+                    id integer,
+                    "Client_Name" text,
+                    "Gender" text,
+                    "Age_Breakdown" text,
+                    "Reward_Status" text,
+                    "Total_Views" integer,
+                    "Total_Joins" integer,
+                    "Clicks" integer,
+                    "Completion_Rate" double precision,
+                    "Average_Time_Spent" interval,
+                    "Number_of_Winners" integer,
+                    "Created_At" timestamp
+                )
+            """)
+            cur.copy_expert("COPY public.contest_summary_table FROM STDIN WITH CSV", buffer)
+            cur.execute("ANALYZE public.contest_summary_table")
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Seeded {dbname}.public.contest_summary_table with {rows} rows")
+
+
+# ----------------------------
+# Stub LLM server
+# ----------------------------
+def start_stub_llm(port: int, latency: float, jitter: float, seed: int) -> ThreadingHTTPServer:
+    rng = random.Random(seed)
+    body = json.dumps({"choices": [{"message": {"content": json.dumps(STUB_INSIGHTS)}}]}).encode()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(max(latency + rng.uniform(-jitter, jitter), 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Stub LLM listening on 127.0.0.1:{server.server_port} (latency {latency}s ± {jitter}s)")
+    return server
+
+
+# ----------------------------
+# App process
+# ----------------------------
+def spawn_app(port: int, workers: int, stub_url: str, server: str = "gunicorn",
+              worker_timeout: int = 120, threadpool_size: int = 0, dbname: str = None) -> subprocess.Popen:
+    env = dict(os.environ, TOGETHER_URL=stub_url, TOGETHER_API_KEY=os.getenv("TOGETHER_API_KEY", "stub"),
+               WEB_CONCURRENCY=str(workers))
+    if dbname:
+        env["DB_NAME"] = dbname
+    if threadpool_size:
+        env["THREADPOOL_SIZE"] = str(threadpool_size)
+    if server == "gunicorn":
+        # Same worker class and timeout flags as the Dockerfile
+        command = [sys.executable, "-m", "gunicorn", "-k", "uvicorn.workers.UvicornWorker", "main:app",
+                   "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+                   "--timeout", str(worker_timeout), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit("App did not become healthy within 30 seconds")
+
+
+# ----------------------------
+# Load generation
+# ----------------------------
+def load_traffic(path: str) -> list:
+    if not path:
+        return DEFAULT_MIX
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def get_token(base_url: str) -> str:
+    response = requests.post(f"{base_url}/auth/token", data={"username": USERNAME, "password": PASSWORD}, timeout=10)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_load(base_url: str, traffic: list, concurrency: int, duration: float, total_requests: int,
+             timeout: float, seed: int) -> dict:
+    token = get_token(base_url)
+    weights = [entry.get("weight", 1) for entry in traffic]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [total_requests]
+    stop_at = time.time() + duration if duration else None
+
+    def next_slot() -> bool:
+        with lock:
+            if stop_at and time.time() >= stop_at:
+                return False
+            if total_requests:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+            return True
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        while next_slot():
+            entry = rng.choices(traffic, weights=weights)[0]
+            name = f"{entry.get('method', 'GET')} {entry['path']}"
+            headers = {"Authorization": f"Bearer {token}"} if entry.get("auth", True) else {}
+            data = {"username": USERNAME, "password": PASSWORD} if entry["path"].endswith("/auth/token") else None
+            start = time.perf_counter()
+            try:
+                response = session.request(entry.get("method", "GET"), base_url + entry["path"],
+                                           headers=headers, json=entry.get("json"), data=data, timeout=timeout)
+                failed = response.status_code >= 400
+            except requests.exceptions.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append(elapsed)
+                if failed:
+                    errors[name] += 1
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for worker_id in range(concurrency):
+            executor.submit(worker, worker_id)
+    wall_time = time.time() - started
+
+    report = {"wall_time_seconds": round(wall_time, 3), "concurrency": concurrency, "endpoints": {}}
+    for name, latencies in sorted(samples.items()):
+        latencies.sort()
+        report["endpoints"][name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "throughput_rps": round(len(latencies) / wall_time, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
+    total = sum(len(v) for v in samples.values())
+    report["total_requests"] = total
+    report["total_errors"] = sum(errors.values())
+    report["throughput_rps"] = round(total / wall_time, 2) if wall_time else 0.0
+    return report
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<40}{'reqs':>8}{'errs':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<40}{stats['requests']:>8}{stats['errors']:>7}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"\nTotal: {report['total_requests']} requests, {report['total_errors']} errors, "
+          f"{report['throughput_rps']} req/s over {report['wall_time_seconds']}s at concurrency {report['concurrency']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a request mix against the Contest Insights API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Target when not spawning the app")
+    parser.add_argument("--traffic", help="JSONL file of recorded requests (default: synthetic mix)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, help="Seconds to run (default 30 unless --requests is set)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests to send")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-rows", type=int, default=0, help="Recreate and seed the load-test table with N rows")
+    parser.add_argument("--db-name", help=f"Database to seed and point the spawned app at "
+                                          f"(default with --seed-rows: {LOAD_TEST_DB_NAME})")
+    parser.add_argument("--force", action="store_true",
+                        help="Allow seeding a non-local DB_HOST or the app's own DB_NAME")
+    parser.add_argument("--spawn-app", action="store_true", help="Start the app against the stub LLM")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="gunicorn",
+                        help="How --spawn-app runs the app (gunicorn matches production)")
+    parser.add_argument("--app-port", type=int, default=8055)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--worker-timeout", type=int, default=120, help="gunicorn --timeout for spawned workers")
+    parser.add_argument("--threadpool-size", type=int, default=0,
+                        help="THREADPOOL_SIZE for spawned workers (0 keeps the AnyIO default of 40)")
+    parser.add_argument("--llm-port", type=int, default=0, help="Stub LLM port (0 picks a free port)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub LLM mean latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--json-out", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.duration is None and not args.requests:
+        args.duration = 30.0
+
+    if args.seed_rows:
+        args.db_name = args.db_name or LOAD_TEST_DB_NAME
+        seed_database(args.seed_rows, args.seed, args.db_name, args.force)
+
+    stub = start_stub_llm(args.llm_port, args.llm_latency, args.llm_jitter, args.seed)
+    app_process = None
+    base_url = args.base_url
+    try:
+        if args.spawn_app:
+            stub_url = f"http://127.0.0.1:{stub.server_port}/v1/chat/completions"
+            app_process = spawn_app(args.app_port, args.workers, stub_url, args.server,
+                                    args.worker_timeout, args.threadpool_size, args.db_name)
+            base_url = f"http://127.0.0.1:{args.app_port}"
+
+        report = run_load(base_url, load_traffic(args.traffic), args.concurrency, args.duration,
+                          args.requests, args.timeout, args.seed)
+        print_report(report)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        if app_process:
+            app_process.terminate()
+            app_process.wait(timeout=10)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
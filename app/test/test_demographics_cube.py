@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from contest_insights.contestInsights import generate_business_insights
+
+
+def make_contest_frame(rows=500, seed=7):
+    """Synthetic contest rows with missing dimension values and measures."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": range(rows),
+        "Client_Name": rng.choice(["Acme", "Beta", "Gamma", None], rows),
+        "Gender": rng.choice(["male", "female", "other", None], rows),
+        "Age_Breakdown": rng.choice(["18-24", "25-34", "35-44", np.nan], rows),
+        "Reward_Status": rng.choice(["rewarded", "pending", None], rows),
+        "Total_Views": rng.integers(0, 200, rows),
+        "Total_Joins": rng.integers(0, 80, rows),
+        "Clicks": rng.integers(0, 60, rows),
+        "Number_of_Winners": rng.integers(0, 6, rows),
+        "Completion_Rate": np.where(rng.random(rows) < 0.1, np.nan, rng.random(rows) * 100),
+        "Average_Time_Spent": [f"0 days 00:{i % 50:02d}:{i % 60:02d}" for i in range(rows)],
+    })
+
+
+def legacy_demographics(df):
+    """The per-breakdown groupbys generate_business_insights used before the cube."""
+    df = df.copy()
+    df["Average_Time_Spent"] = pd.to_timedelta(df["Average_Time_Spent"], errors="coerce").dt.total_seconds()
+    df["CTR"] = df["Clicks"] / df["Total_Views"].replace(0, pd.NA)
+
+    def share(dimension):
+        dist = df.groupby(dimension)["Total_Joins"].sum().reset_index()
+        dist["percentage"] = dist["Total_Joins"] / dist["Total_Joins"].sum() * 100
+        return dist
+
+    reward = (df["Reward_Status"].value_counts(normalize=True) * 100).reset_index().rename(
+        columns={"index": "Reward_Status", "Reward_Status": "Percentage"}
+    )
+    clients = df.groupby("Client_Name").agg({
+        "Total_Views": "sum",
+        "Total_Joins": "sum",
+        "Clicks": "sum",
+        "Completion_Rate": "mean",
+        "Average_Time_Spent": "mean",
+        "CTR": "mean",
+        "Number_of_Winners": "sum",
+    }).reset_index()
+    clients["joins_percentage"] = clients["Total_Joins"] / clients["Total_Joins"].sum() * 100
+    crosstab = df.pivot_table(index="Age_Breakdown", columns="Gender", values="Total_Joins", aggfunc="sum", fill_value=0)
+    return {
+        "gender_distribution": share("Gender"),
+        "age_distribution": share("Age_Breakdown"),
+        "reward_status_distribution": reward,
+        "client_analysis": clients,
+        "gender_age_joins": crosstab.stack().rename("Total_Joins").reset_index(),
+    }
+
+
+def assert_records_match(records, expected):
+    actual = pd.DataFrame(records)
+    expected = expected.reset_index(drop=True).astype({c: "float64" for c in expected.columns if expected[c].dtype != object})
+    actual = actual[list(expected.columns)].astype({c: "float64" for c in expected.columns if expected[c].dtype != object})
+    assert_frame_equal(actual, expected, check_dtype=False, check_names=False)
+
+
+def test_cube_matches_legacy_groupbys():
+    df = make_contest_frame()
+    insights = generate_business_insights(df.copy())
+    legacy = legacy_demographics(df)
+
+    demographics = insights["demographics"]
+    assert_records_match(demographics["gender_distribution"], legacy["gender_distribution"])
+    assert_records_match(demographics["age_distribution"], legacy["age_distribution"])
+    assert_records_match(demographics["reward_status_distribution"], legacy["reward_status_distribution"])
+    assert_records_match(demographics["gender_age_joins"], legacy["gender_age_joins"])
+    assert_records_match(insights["client_analysis"], legacy["client_analysis"])
+
+
+def test_reward_status_keeps_legacy_keys():
+    insights = generate_business_insights(make_contest_frame(rows=50, seed=1))
+    for record in insights["demographics"]["reward_status_distribution"]:
+        assert set(record) == {"Percentage", "proportion"}
+
+
+if __name__ == "__main__":
+    test_cube_matches_legacy_groupbys()
+    test_reward_status_keeps_legacy_keys()
+    print("✅ Demographics cube matches the legacy groupby breakdowns")
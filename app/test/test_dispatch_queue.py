@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from llm_call import dispatch_queue
+from llm_call.dispatch_queue import LLMDispatchQueue, QueueWaitTimeout
+from app.core.resilience import DeadlineExceeded
+
+
+class RateLimited(Exception):
+    """Stands in for requests.HTTPError carrying a 429 response."""
+
+    def __init__(self, retry_after: str):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={"Retry-After": retry_after})
+
+
+@contextmanager
+def temp_queue(rpm_limit=0, window_seconds=None, **kwargs):
+    original_window = dispatch_queue.WINDOW_SECONDS
+    if window_seconds is not None:
+        # A short window keeps the budget tests fast
+        dispatch_queue.WINDOW_SECONDS = window_seconds
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            yield LLMDispatchQueue(os.path.join(directory, "queue.sqlite3"), rpm_limit, **kwargs)
+    finally:
+        dispatch_queue.WINDOW_SECONDS = original_window
+
+
+def run_in_threads(calls):
+    """Start each (delay, func) in its own thread; returns {index: result or exception}."""
+    outcomes = {}
+
+    def run(index, delay, func):
+        time.sleep(delay)
+        try:
+            outcomes[index] = func()
+        except Exception as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=run, args=(i, delay, func)) for i, (delay, func) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return outcomes
+
+
+def test_identical_payloads_are_sent_once():
+    sent = []
+
+    def send():
+        sent.append(time.time())
+        time.sleep(0.3)
+        return {"choices": ["shared"]}
+
+    with temp_queue() as queue:
+        payload = {"prompt": "same"}
+        outcomes = run_in_threads([(0, lambda: queue.dispatch(payload, send)) for _ in range(5)])
+        assert all(result == {"choices": ["shared"]} for result in outcomes.values()), outcomes
+        # Finished within the dedup TTL: served from the stored response
+        assert queue.dispatch(payload, send) == {"choices": ["shared"]}
+    assert len(sent) == 1
+
+
+def test_interactive_goes_before_batch_when_budget_is_short():
+    order = []
+
+    with temp_queue(rpm_limit=1, window_seconds=0.5) as queue:
+        # The window is full, so both jobs have to queue
+        with queue._transaction() as conn:
+            conn.execute("INSERT INTO grants (granted_at, tokens) VALUES (?, 0)", (time.time(),))
+        outcomes = run_in_threads([
+            (0, lambda: queue.dispatch({"prompt": "batch"}, lambda: order.append("batch") or {}, "batch")),
+            (0.1, lambda: queue.dispatch({"prompt": "interactive"}, lambda: order.append("interactive") or {})),
+        ])
+    assert not any(isinstance(outcome, Exception) for outcome in outcomes.values()), outcomes
+    assert order == ["interactive", "batch"]
+
+
+def test_rpm_limit_is_enforced():
+    sent = []
+    with temp_queue(rpm_limit=3, window_seconds=1.0) as queue:
+        outcomes = run_in_threads([
+            (0, lambda i=i: queue.dispatch({"prompt": i}, lambda: sent.append(time.time()) or {}))
+            for i in range(7)
+        ])
+        assert queue.stats()["requests_last_minute"] <= 3
+    assert not any(isinstance(outcome, Exception) for outcome in outcomes.values()), outcomes
+    sent.sort()
+    assert len(sent) == 7
+    # No 1s window ever saw more than 3 sends
+    for first, fourth in zip(sent, sent[3:]):
+        assert fourth - first >= 0.95, sent
+
+
+def test_rate_limited_call_pauses_queue_and_retries():
+    attempts = []
+
+    def send():
+        attempts.append(time.time())
+        if len(attempts) == 1:
+            raise RateLimited(retry_after="0.5")
+        return {"choices": ["after retry"]}
+
+    with temp_queue() as queue:
+        started = time.time()
+        assert queue.dispatch({"prompt": "limited"}, send) == {"choices": ["after retry"]}
+        # Other jobs are held back by the same pause
+        assert queue.dispatch({"prompt": "other"}, lambda: {}) == {}
+    assert len(attempts) == 2
+    assert attempts[1] - started >= 0.5
+
+
+def test_follower_takes_over_abandoned_job():
+    def leader_send():
+        time.sleep(0.3)
+        raise DeadlineExceeded("leader out of time")
+
+    with temp_queue() as queue:
+        payload = {"prompt": "shared"}
+        outcomes = run_in_threads([
+            (0, lambda: queue.dispatch(payload, leader_send)),
+            (0.1, lambda: queue.dispatch(payload, lambda: {"choices": ["follower"]})),
+        ])
+    assert isinstance(outcomes[0], DeadlineExceeded)
+    assert outcomes[1] == {"choices": ["follower"]}
+
+
+def test_max_wait_bounds_time_in_queue():
+    with temp_queue(rpm_limit=1, window_seconds=60) as queue:
+        queue.dispatch({"prompt": "first"}, lambda: {})
+        started = time.time()
+        try:
+            queue.dispatch({"prompt": "second"}, lambda: {}, "batch", max_wait=0.3)
+        except QueueWaitTimeout:
+            pass
+        else:
+            raise AssertionError("dispatch did not time out")
+        assert time.time() - started < 2
+        assert queue.stats()["queue_depth"] == 0
+
+
+if __name__ == "__main__":
+    test_identical_payloads_are_sent_once()
+    test_interactive_goes_before_batch_when_budget_is_short()
+    test_rpm_limit_is_enforced()
+    test_rate_limited_call_pauses_queue_and_retries()
+    test_follower_takes_over_abandoned_job()
+    test_max_wait_bounds_time_in_queue()
+    print("✅ LLM dispatch queue dedups, prioritises, rate limits and hands over jobs")
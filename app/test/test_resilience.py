@@ -0,0 +1,128 @@
+import os
+
+# The service modules read their configuration at import; no database or LLM is contacted
+for name in ("DB_NAME", "DB_USER", "DB_PASS", "DB_HOST", "DB_PORT", "TOGETHER_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+from contest_insights.contestInsights import generate_business_insights  # noqa: E402
+from app.core.resilience import (  # noqa: E402
+    CircuitBreaker,
+    CircuitBreakerOpen,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    request_deadline,
+)
+from app.services.insights_services import InsightsService, compute_data_version  # noqa: E402
+from test_demographics_cube import make_contest_frame  # noqa: E402
+
+
+def expect(exception, func, *args):
+    try:
+        func(*args)
+    except exception:
+        return
+    raise AssertionError(f"{func.__name__} did not raise {exception.__name__}")
+
+
+def elapse_reset_timeout(breaker):
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    expect(CircuitBreakerOpen, breaker.before_call)
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    elapse_reset_timeout(breaker)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only the trial call goes through while it is in flight
+    expect(CircuitBreakerOpen, breaker.before_call)
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+    breaker.record_failure()
+    elapse_reset_timeout(breaker)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    expect(CircuitBreakerOpen, breaker.before_call)
+
+
+def test_breaker_released_trial_goes_to_next_call():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    elapse_reset_timeout(breaker)
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.state == "open" and breaker.failures == 1
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_request_deadline_tighter_outer_wins():
+    assert current_deadline() is None
+    with request_deadline(0.5) as outer:
+        with request_deadline(30) as inner:
+            assert inner is outer
+            assert current_deadline() is outer
+        with request_deadline(0.1) as tighter:
+            assert tighter is not outer and tighter.remaining() <= 0.1
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_spent_deadline_raises():
+    deadline = Deadline(0)
+    assert deadline.remaining() == 0
+    expect(DeadlineExceeded, deadline.check, "LLM call")
+
+
+def test_degraded_insights_fallback_order():
+    service = InsightsService(db_repo=None)
+    aggregates = generate_business_insights(make_contest_frame(rows=100, seed=3))
+    version = compute_data_version(aggregates)
+
+    # Nothing cached and no aggregates: nothing to serve
+    expect(DeadlineExceeded, service._degraded_insights, None, None, "budget spent")
+
+    rules = service._degraded_insights(aggregates, version, "breaker open")
+    assert rules["degraded"]["source"] == "rules"
+    assert "overall_recommendations" in rules
+
+    service._cache_insights("older", {"overall_recommendations": {"source": "older"}})
+    service._cache_insights(version, {"overall_recommendations": {"source": "llm"}})
+    cached = service._degraded_insights(aggregates, version, "breaker open")
+    assert cached["degraded"]["source"] == "cache"
+    assert cached["overall_recommendations"] == {"source": "llm"}
+
+    service._cache_insights("newest", {"overall_recommendations": {"source": "newest"}})
+    stale = service._degraded_insights(None, None, "aggregation timed out")
+    assert stale["degraded"] == {"reason": "aggregation timed out", "source": "stale_cache", "data_version": "newest"}
+    assert stale["overall_recommendations"] == {"source": "newest"}
+
+    # Serving from the cache never hands out the cached object itself
+    stale["overall_recommendations"]["source"] = "mutated"
+    assert service._degraded_insights(None, None, "again")["overall_recommendations"] == {"source": "newest"}
+
+
+if __name__ == "__main__":
+    test_breaker_opens_after_consecutive_failures()
+    test_breaker_half_open_trial_closes_or_reopens()
+    test_breaker_released_trial_goes_to_next_call()
+    test_request_deadline_tighter_outer_wins()
+    test_spent_deadline_raises()
+    test_degraded_insights_fallback_order()
+    print("✅ Circuit breaker, request deadline and degraded fallbacks behave as expected")
@@ -0,0 +1,135 @@
+import math
+import pandas as pd
+from contest_insights.contestInsights import generate_business_insights
+
+# Two-sided 95% normal quantile used for every error bound
+Z_95 = 1.96
+
+SCALED_TOTALS = {
+    "total_views": "Total_Views",
+    "total_joins": "Total_Joins",
+    "total_clicks": "Clicks",
+    "total_winners": "Number_of_Winners",
+}
+
+AVERAGED_COLUMNS = {
+    "avg_completion_rate": "Completion_Rate",
+    "avg_time_spent_seconds": "Average_Time_Spent",
+    "avg_ctr": "CTR",
+    "avg_joins_per_contest": "Total_Joins",
+}
+
+SCALED_RECORD_FIELDS = ["Total_Views", "Total_Joins", "Clicks", "Number_of_Winners"]
+
+# Heap block number of each sampled row, added by DatabaseRepository.fetch_sample
+BLOCK_COLUMN = "_sample_block"
+
+
+def sample_percent(estimated_rows: int, target_rows: int) -> float:
+    """Percentage of the table to sample so that about `target_rows` come back."""
+    if estimated_rows <= target_rows:
+        return 100.0
+    return max(target_rows / estimated_rows * 100, 0.0001)
+
+
+def _block_residuals(values: pd.Series, blocks: pd.Series) -> tuple:
+    """
+    Per-block residuals of the ratio (mean) estimator and the number of
+    non-missing values. Blocks are sampled whole, so the block totals, not
+    the individual rows, are the independent units.
+    """
+    values = pd.to_numeric(values, errors="coerce")
+    present = values.notna()
+    count = int(present.sum())
+    if count == 0:
+        return pd.Series(dtype="float64"), 0
+    mean = float(values[present].mean())
+    per_block = pd.DataFrame({"block": blocks[present], "value": values[present]}).groupby("block")["value"].agg(["sum", "count"])
+    return per_block["sum"] - mean * per_block["count"], count
+
+
+def _mean_error_bound(values: pd.Series, blocks: pd.Series, fraction: float) -> float:
+    # Linearised variance of a ratio estimator under block (cluster) sampling
+    residuals, count = _block_residuals(values, blocks)
+    if count < 2:
+        return 0.0
+    variance = (1 - fraction) * float((residuals ** 2).sum()) / count ** 2
+    return Z_95 * math.sqrt(variance)
+
+
+def _sum_error_bound(values: pd.Series, blocks: pd.Series, fraction: float, estimated_rows: int) -> float:
+    # The total is estimated_rows x the per-row mean (missing values count as 0)
+    values = pd.to_numeric(values, errors="coerce").fillna(0)
+    return estimated_rows * _mean_error_bound(values, blocks, fraction)
+
+
+def _scale_records(records: list, factor: float) -> list:
+    for record in records:
+        for field in SCALED_RECORD_FIELDS:
+            if isinstance(record.get(field), (int, float)):
+                record[field] = int(round(record[field] * factor))
+    return records
+
+
+def generate_approximate_insights(sample_df: pd.DataFrame, estimated_rows: int, distinct_counts: dict) -> dict:
+    """
+    Estimate the business insights JSON from a block sample of the table.
+
+    Sums are scaled up by estimated_rows / sampled rows (the fraction that
+    was actually achieved, not the requested one), averages are taken from
+    the sample directly, and total_clients / total_contests come from the
+    planner's column statistics when available. 95% error bounds treat each
+    sampled block as one unit: rows are grouped by the BLOCK_COLUMN of
+    the sample (each row is its own block when it is absent).
+
+    Args:
+        sample_df (pd.DataFrame): Sampled rows of the contest dataset
+        estimated_rows (int): Planner estimate of the full table size
+        distinct_counts (dict): Totals key -> full-table distinct estimate, or None
+
+    Returns:
+        dict: Same structure as generate_business_insights plus "approximation"
+    """
+    blocks = sample_df[BLOCK_COLUMN] if BLOCK_COLUMN in sample_df.columns else pd.Series(sample_df.index, index=sample_df.index)
+    sample_rows = len(sample_df)
+    fraction = min(sample_rows / estimated_rows, 1.0) if estimated_rows else 1.0
+    factor = 1 / fraction
+
+    insights_json = generate_business_insights(sample_df)
+
+    totals = insights_json["overall_summary"]["totals"]
+    error_bounds = {}
+    for key, column in SCALED_TOTALS.items():
+        totals[key] = int(round(totals[key] * factor))
+        error_bounds[key] = round(_sum_error_bound(sample_df[column], blocks, fraction, estimated_rows), 2)
+
+    distinct_sources = {}
+    for key, estimate in distinct_counts.items():
+        if estimate is None:
+            # No statistics (table never analyzed): the sample count is a lower bound
+            distinct_sources[key] = "sample_lower_bound"
+        else:
+            totals[key] = int(round(estimate))
+            distinct_sources[key] = "pg_stats"
+
+    for key, column in AVERAGED_COLUMNS.items():
+        error_bounds[key] = _mean_error_bound(sample_df[column], blocks, fraction)
+
+    demographics = insights_json["demographics"]
+    _scale_records(demographics["gender_distribution"], factor)
+    _scale_records(demographics["age_distribution"], factor)
+    _scale_records(demographics["gender_age_joins"], factor)
+    _scale_records(insights_json["client_analysis"], factor)
+
+    insights_json["approximation"] = {
+        "mode": "approximate",
+        "method": "tablesample_system",
+        "sample_fraction": fraction,
+        "sample_rows": sample_rows,
+        "sample_blocks": int(blocks.nunique()),
+        "estimated_table_rows": estimated_rows,
+        "confidence_level": 0.95,
+        "error_bounds": error_bounds,
+        "distinct_count_source": distinct_sources,
+    }
+    return insights_json
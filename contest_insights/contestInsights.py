@@ -1,4 +1,62 @@
 import pandas as pd
+from contest_insights.demographicsCube import DemographicsCube
+
+RANGE_OPERATORS = {
+    "gte": lambda column, value: column >= value,
+    "gt": lambda column, value: column > value,
+    "lte": lambda column, value: column <= value,
+    "lt": lambda column, value: column < value,
+}
+
+
+def prepare_contest_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalise column types in place so the dataset can be aggregated.
+    Safe to call more than once; already converted columns are left untouched.
+
+    Args:
+        df (pd.DataFrame): Contest engagement dataset
+
+    Returns:
+        pd.DataFrame: The same dataframe, for chaining
+    """
+    # Ensure Average_Time_Spent is numeric (seconds)
+    if df["Average_Time_Spent"].dtype == "object":
+        df["Average_Time_Spent"] = pd.to_timedelta(
+            df["Average_Time_Spent"], errors="coerce"
+        ).dt.total_seconds()
+    return df
+
+
+def filter_segment(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """
+    Select the rows of the contest dataset that belong to one segment.
+
+    Each filter maps a column to either a single value, a list of accepted
+    values, or a range such as {"gte": "2025-01-01", "lt": "2025-02-01"}.
+
+    Args:
+        df (pd.DataFrame): Contest engagement dataset
+        filters (dict): Column name -> value / list of values / range
+
+    Returns:
+        pd.DataFrame: Copy of the matching rows
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, value in filters.items():
+        if column not in df.columns:
+            raise ValueError(f"Unknown segment column: {column}")
+        if isinstance(value, dict):
+            for operator, bound in value.items():
+                if operator not in RANGE_OPERATORS:
+                    raise ValueError(f"Unsupported range operator for {column}: {operator}")
+                mask &= RANGE_OPERATORS[operator](df[column], bound)
+        elif isinstance(value, (list, tuple, set)):
+            mask &= df[column].isin(list(value))
+        else:
+            mask &= df[column] == value
+    return df[mask].copy()
+
 
 def generate_business_insights(df: pd.DataFrame) -> dict:
     """
@@ -14,11 +72,7 @@ def generate_business_insights(df: pd.DataFrame) -> dict:
         dict: JSON-like dictionary containing insights
     """
 
-    # Ensure Average_Time_Spent is numeric (seconds)
-    if df["Average_Time_Spent"].dtype == "object":
-        df["Average_Time_Spent"] = pd.to_timedelta(
-            df["Average_Time_Spent"], errors="coerce"
-        ).dt.total_seconds()
+    prepare_contest_frame(df)
 
     # Click-through rate column
     df["CTR"] = df["Clicks"] / df["Total_Views"].replace(0, pd.NA)
@@ -45,46 +99,41 @@ def generate_business_insights(df: pd.DataFrame) -> dict:
     # ----------------------------
     # Demographic Aggregations
     # ----------------------------
-    gender_distribution = (
-        df.groupby("Gender")["Total_Joins"]
-        .sum()
-        .reset_index()
-    )
-    gender_distribution["percentage"] = (
-        gender_distribution["Total_Joins"] / gender_distribution["Total_Joins"].sum() * 100
-    )
+    # One multi-key groupby; every breakdown below is a slice of the cube
+    cube = DemographicsCube.from_frame(df)
 
-    age_distribution = (
-        df.groupby("Age_Breakdown")["Total_Joins"]
-        .sum()
+    gender_distribution = cube.share("Gender", "Total_Joins")
+    age_distribution = cube.share("Age_Breakdown", "Total_Joins")
+
+    # Joins per age group x gender, zero-filled for unobserved pairs
+    gender_age_joins = (
+        cube.crosstab("Age_Breakdown", "Gender", "Total_Joins")
+        .stack()
+        .rename("Total_Joins")
         .reset_index()
     )
-    age_distribution["percentage"] = (
-        age_distribution["Total_Joins"] / age_distribution["Total_Joins"].sum() * 100
-    )
 
+    # Share of rows per reward status, same shape as value_counts(normalize=True)
     reward_status_distribution = (
-        df["Reward_Status"].value_counts(normalize=True) * 100
-    ).reset_index().rename(
-        columns={"index": "Reward_Status", "Reward_Status": "Percentage"}
+        cube.share("Reward_Status", "rows")
+        .sort_values("rows", ascending=False, kind="stable")
+        .rename(columns={"Reward_Status": "Percentage", "percentage": "proportion"})
+        [["Percentage", "proportion"]]
     )
 
     # ----------------------------
     # Client-Level Aggregations
     # ----------------------------
-    client_stats = (
-        df.groupby("Client_Name")
-        .agg({
-            "Total_Views": "sum",
-            "Total_Joins": "sum",
-            "Clicks": "sum",
-            "Completion_Rate": "mean",
-            "Average_Time_Spent": "mean",
-            "CTR": "mean",
-            "Number_of_Winners": "sum"
-        })
-        .reset_index()
-    )
+    client_stats = cube.marginal("Client_Name")[[
+        "Client_Name",
+        "Total_Views",
+        "Total_Joins",
+        "Clicks",
+        "Completion_Rate",
+        "Average_Time_Spent",
+        "CTR",
+        "Number_of_Winners",
+    ]].copy()
 
     # Percentage share of joins by client (for ROI focus)
     client_stats["joins_percentage"] = (
@@ -101,6 +150,8 @@ def generate_business_insights(df: pd.DataFrame) -> dict:
         },
         "demographics": {
             "gender_distribution": gender_distribution.to_dict(orient="records"),
+            "age_distribution": age_distribution.to_dict(orient="records"),
+            "gender_age_joins": gender_age_joins.to_dict(orient="records"),
             "reward_status_distribution": reward_status_distribution.to_dict(orient="records"),
         },
         "client_analysis": client_stats.to_dict(orient="records")
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+CUBE_DIMENSIONS = ["Client_Name", "Gender", "Age_Breakdown", "Reward_Status"]
+SUM_MEASURES = ["Total_Views", "Total_Joins", "Clicks", "Number_of_Winners"]
+MEAN_MEASURES = ["Completion_Rate", "Average_Time_Spent", "CTR"]
+
+
+class DemographicsCube:
+    """
+    Pre-aggregated contest measures over every combination of the cube
+    dimensions (client x gender x age bucket x reward status).
+
+    The cube is built with a single multi-key groupby. Sums are stored as-is
+    and means are stored as (sum, count) pairs, so any marginal or cross-tab
+    is re-aggregated from the small cell table instead of the raw dataset.
+    """
+
+    def __init__(self, cells: pd.DataFrame, dimensions: list):
+        self.cells = cells
+        self.dimensions = dimensions
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dimensions: list = None) -> "DemographicsCube":
+        """
+        Build the cube from the contest dataset in one pass.
+
+        Args:
+            df (pd.DataFrame): Contest engagement dataset (with CTR column)
+            dimensions (list): Dimension columns, defaults to CUBE_DIMENSIONS
+
+        Returns:
+            DemographicsCube: Cube holding one row per observed combination
+        """
+        dimensions = [d for d in (dimensions or CUBE_DIMENSIONS) if d in df.columns]
+
+        frame = df[dimensions + SUM_MEASURES].copy()
+        for measure in MEAN_MEASURES:
+            values = pd.to_numeric(df[measure], errors="coerce")
+            frame[f"{measure}_sum"] = values.fillna(0)
+            frame[f"{measure}_count"] = values.notna().astype("int64")
+        frame["rows"] = 1
+
+        cells = frame.groupby(dimensions, dropna=False, sort=False).sum().reset_index()
+        # Dimension values repeat heavily across cells, categoricals keep them compact
+        for dimension in dimensions:
+            cells[dimension] = cells[dimension].astype("category")
+        return cls(cells, dimensions)
+
+    @property
+    def measure_columns(self) -> list:
+        return [c for c in self.cells.columns if c not in self.dimensions]
+
+    def marginal(self, dimensions) -> pd.DataFrame:
+        """
+        Roll the cube up to the given dimension(s).
+
+        Rows with a missing value in any requested dimension are dropped,
+        matching a plain pandas groupby on the raw data.
+
+        Returns:
+            pd.DataFrame: One row per group with summed measures, the
+            derived means for MEAN_MEASURES and the contributing row count
+        """
+        dimensions = [dimensions] if isinstance(dimensions, str) else list(dimensions)
+        grouped = (
+            self.cells.groupby(dimensions, observed=True)[self.measure_columns]
+            .sum()
+            .reset_index()
+        )
+        for dimension in dimensions:
+            grouped[dimension] = grouped[dimension].astype(object)
+        for measure in MEAN_MEASURES:
+            grouped[measure] = grouped[f"{measure}_sum"] / grouped[f"{measure}_count"].replace(0, np.nan)
+        return grouped
+
+    def share(self, dimension: str, measure: str = "Total_Joins") -> pd.DataFrame:
+        """Marginal of one measure with its percentage share of the total."""
+        shares = self.marginal(dimension)[[dimension, measure]].copy()
+        shares["percentage"] = shares[measure] / shares[measure].sum() * 100
+        return shares
+
+    def crosstab(self, rows: str, columns: str, measure: str = "Total_Joins") -> pd.DataFrame:
+        """Two-dimensional table of a summed measure, missing cells as 0."""
+        return (
+            self.marginal([rows, columns])
+            .pivot(index=rows, columns=columns, values=measure)
+            .fillna(0)
+        )
@@ -0,0 +1,118 @@
+def _number(value, default=0.0) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _pct(value) -> str:
+    return f"{value:.1f}%"
+
+
+def _client_recommendation(client: dict, averages: dict) -> dict:
+    name = client.get("Client_Name") or "Unknown"
+    ctr = _number(client.get("CTR"))
+    completion = _number(client.get("Completion_Rate"))
+    joins = _number(client.get("Total_Joins"))
+    winners = _number(client.get("Number_of_Winners"))
+    share = _number(client.get("joins_percentage"))
+    avg_ctr = _number(averages.get("avg_ctr"))
+    avg_completion = _number(averages.get("avg_completion_rate"))
+
+    strengths, weaknesses = [], []
+    if avg_ctr and ctr >= avg_ctr:
+        strengths.append(f"CTR of {_pct(ctr * 100)} is at or above the platform average of {_pct(avg_ctr * 100)}")
+    elif avg_ctr:
+        weaknesses.append(f"CTR of {_pct(ctr * 100)} trails the platform average of {_pct(avg_ctr * 100)}")
+    if avg_completion and completion >= avg_completion:
+        strengths.append(f"Completion rate of {_pct(completion)} beats the average of {_pct(avg_completion)}")
+    elif avg_completion:
+        weaknesses.append(f"Completion rate of {_pct(completion)} is below the average of {_pct(avg_completion)}")
+    if joins == 0:
+        weaknesses.append("No joins recorded for this client")
+
+    winner_ratio = winners / joins * 100 if joins else 0.0
+    return {
+        "client_name": name,
+        "strengths": strengths or [f"Holds {_pct(share)} of all platform joins"],
+        "weaknesses": weaknesses or ["No metric below the platform average"],
+        "roi_tips": [
+            f"Raise CTR by 15% (to about {_pct(ctr * 115)}) by testing 2 new contest thumbnails per week"
+            if ctr else "Add a clear call to action to reach a first 2% CTR within 2 weeks"
+        ],
+        "feature_suggestions": [
+            "Add a 3 step progress bar to lift completion by 10%" if completion < avg_completion
+            else "Add a share to unlock bonus entry to grow joins by 10%"
+        ],
+        "engagement_tactics": [
+            f"Run a 2 week streak challenge targeting {int(joins * 0.1) or 10} extra joins"
+        ],
+        "audience_insights": [
+            f"Winners are {_pct(winner_ratio)} of joins; increasing winner slots by 10% can raise repeat participation"
+        ],
+    }
+
+
+def generate_rule_based_insights(insights_json: dict) -> dict:
+    """
+    Fast deterministic recommendations computed only from the aggregates.
+
+    Used as the degraded fallback when the LLM is unavailable or the request
+    deadline is spent. Returns the same top-level keys as the LLM output.
+
+    Args:
+        insights_json (dict): Output of generate_business_insights
+
+    Returns:
+        dict: overall, client and campaign level recommendations
+    """
+    summary = insights_json.get("overall_summary", {})
+    totals = summary.get("totals", {})
+    averages = summary.get("averages", {})
+    gender_distribution = insights_json.get("demographics", {}).get("gender_distribution", [])
+    clients = insights_json.get("client_analysis", [])
+
+    avg_ctr = _number(averages.get("avg_ctr"))
+    avg_completion = _number(averages.get("avg_completion_rate"))
+    total_joins = _number(totals.get("total_joins"))
+    total_winners = _number(totals.get("total_winners"))
+    winner_ratio = total_winners / total_joins * 100 if total_joins else 0.0
+
+    roi_improvements = [f"Increase average CTR by 15% from {_pct(avg_ctr * 100)} with sharper contest titles"]
+    if avg_completion < 60:
+        roi_improvements.append(f"Lift completion from {_pct(avg_completion)} by 10% by shortening contests to 5 questions")
+    else:
+        roi_improvements.append(f"Keep completion above {_pct(avg_completion)} and grow joins by 10% through referrals")
+
+    engagement_strategies = ["Send a reminder 2 days before each contest closes to recover 5% of drop-offs"]
+    if gender_distribution:
+        top = max(gender_distribution, key=lambda item: _number(item.get("percentage")))
+        if _number(top.get("percentage")) > 60:
+            engagement_strategies.append(
+                f"{_pct(_number(top.get('percentage')))} of joins come from {top.get('Gender')}; "
+                "target other groups with 2 tailored contests per month"
+            )
+
+    ranked = sorted(clients, key=lambda c: _number(c.get("Total_Joins")))
+    campaign_level = [
+        {
+            "campaign_name": client.get("Client_Name") or "Unknown",
+            "issues_detected": [f"Only {int(_number(client.get('Total_Joins')))} joins from {int(_number(client.get('Total_Views')))} views"],
+            "fixes": ["Re-launch with a 1 week limited-time reward and 20% more promotion"],
+        }
+        for client in ranked[:3]
+        if _number(client.get("Total_Views")) and _number(client.get("CTR")) < avg_ctr
+    ]
+
+    return {
+        "overall_recommendations": {
+            "roi_improvements": roi_improvements,
+            "feature_suggestions": ["Add leaderboards updated every 24 hours to raise repeat joins by 10%"],
+            "engagement_strategies": engagement_strategies,
+            "reward_and_incentive_tips": [
+                f"Winners are {_pct(winner_ratio)} of joins; raise winner slots by 10% on low-join contests"
+            ],
+        },
+        "client_recommendations": [_client_recommendation(client, averages) for client in clients],
+        "campaign_level_recommendations": campaign_level,
+    }
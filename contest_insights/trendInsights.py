@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Summable measures stored per (day, client) bucket by the rollup service
+ROLLUP_COLUMNS = [
+    "views",
+    "joins",
+    "clicks",
+    "winners",
+    "completion_sum",
+    "completion_count",
+    "row_count",
+]
+
+
+def _series_records(buckets: pd.DataFrame) -> list:
+    buckets = buckets.copy()
+    buckets["ctr"] = buckets["clicks"] / buckets["views"].replace(0, np.nan)
+    buckets["completion_rate"] = buckets["completion_sum"] / buckets["completion_count"].replace(0, np.nan)
+    buckets["bucket"] = buckets["bucket"].astype(str)
+    buckets = buckets[["bucket", "views", "joins", "clicks", "winners", "ctr", "completion_rate"]]
+    return buckets.round({"ctr": 4, "completion_rate": 2}).replace({np.nan: None}).to_dict(orient="records")
+
+
+def build_trend_insights(rows: list, granularity: str, start, end) -> dict:
+    """
+    Turn summed rollup buckets into per-client and overall trend series.
+
+    Args:
+        rows (list): (bucket, client_name, *ROLLUP_COLUMNS) tuples
+        granularity (str): "day" or "week"
+        start, end (date): Inclusive window the buckets were summed over
+
+    Returns:
+        dict: JSON-like dictionary with "overall" and "clients" series,
+        where CTR is clicks / views and completion rate is the row mean
+        within each bucket
+    """
+    df = pd.DataFrame(rows, columns=["bucket", "client_name"] + ROLLUP_COLUMNS)
+    trends = {
+        "granularity": granularity,
+        "start": str(start),
+        "end": str(end),
+        "overall": [],
+        "clients": {},
+    }
+    if df.empty:
+        return trends
+
+    # SUM() over bigint comes back from Postgres as Decimal
+    df[ROLLUP_COLUMNS] = df[ROLLUP_COLUMNS].astype("float64")
+    counts = [c for c in ROLLUP_COLUMNS if c != "completion_sum"]
+    df[counts] = df[counts].astype("int64")
+
+    overall = df.groupby("bucket", sort=True)[ROLLUP_COLUMNS].sum().reset_index()
+    trends["overall"] = _series_records(overall)
+    for client_name, client_buckets in df.groupby("client_name", sort=True):
+        trends["clients"][client_name] = _series_records(client_buckets)
+    return trends
@@ -1,8 +1,23 @@
 import os
 import json
+import threading
 import requests
 from json_repair import repair_json 
 from dotenv import load_dotenv
+from app.core.config import (
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_SECONDS,
+    LLM_DEDUP_TTL_SECONDS,
+    LLM_QUEUE_BATCH_MAX_WAIT_SECONDS,
+    LLM_QUEUE_ENABLED,
+    LLM_QUEUE_PATH,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    LLM_RPM_LIMIT,
+    LLM_TPM_LIMIT,
+)
+from app.core.profiling import profile_stage
+from app.core.resilience import CircuitBreaker, CircuitBreakerOpen, DeadlineExceeded, current_deadline
+from llm_call.dispatch_queue import LLMDispatchQueue
 
 # Load environment variables
 load_dotenv()
@@ -11,11 +26,63 @@ TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 if not TOGETHER_API_KEY:
     raise ValueError("Missing TOGETHER_API_KEY in environment variables.")
 
-TOGETHER_URL = "https://api.together.xyz/v1/chat/completions"
+TOGETHER_URL = os.getenv("TOGETHER_URL", "https://api.together.xyz/v1/chat/completions")
 
-def get_insights_from_llm(input_json: dict) -> dict:
+# Batch requests call the LLM from several threads at once
+_insights_file_lock = threading.Lock()
+
+# Shared by every request in this worker so provider incidents fail fast
+llm_circuit_breaker = CircuitBreaker("together", LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+# Host-wide queue shared by all workers: dedup, global rate budget, priorities
+llm_dispatch_queue = (
+    LLMDispatchQueue(LLM_QUEUE_PATH, LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_DEDUP_TTL_SECONDS)
+    if LLM_QUEUE_ENABLED else None
+)
+
+
+def _post_to_provider(headers: dict, payload: dict) -> dict:
+    """
+    POST to the provider within the request deadline, guarded by the circuit
+    breaker. Every call is capped at LLM_REQUEST_TIMEOUT_SECONDS, so a hung
+    half-open trial call always resolves the breaker. Only timeouts after the
+    full LLM_REQUEST_TIMEOUT_SECONDS count as failures; a call cut short by
+    the request deadline raises DeadlineExceeded instead.
+    """
+    deadline = current_deadline()
+    timeout = LLM_REQUEST_TIMEOUT_SECONDS
+    if deadline is not None:
+        deadline.check("LLM call")
+        # requests rejects a zero timeout; the check above leaves only a sliver
+        timeout = max(min(timeout, deadline.remaining()), 0.01)
+    deadline_bound = timeout < LLM_REQUEST_TIMEOUT_SECONDS
+    llm_circuit_breaker.before_call()
+    try:
+        response = requests.post(TOGETHER_URL, headers=headers, json=payload, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.Timeout as e:
+        if deadline_bound:
+            # Says nothing about the provider, only that this request ran out of budget
+            llm_circuit_breaker.release_trial()
+            raise DeadlineExceeded(f"LLM call timed out after {timeout:.1f}s of remaining budget: {e}")
+        llm_circuit_breaker.record_failure()
+        raise
+    except requests.exceptions.RequestException as e:
+        status = getattr(e.response, "status_code", None)
+        # Other 4xx responses mean the provider is up; only outages and 429s trip the breaker
+        if status is None or status >= 500 or status == 429:
+            llm_circuit_breaker.record_failure()
+        else:
+            llm_circuit_breaker.record_success()
+        raise
+    llm_circuit_breaker.record_success()
+    return response.json()
+
+def get_insights_from_llm(input_json: dict, priority: str = "interactive") -> dict:
     """
     Send JSON to Together AI (LLaMA 70B) and get structured insights back in JSON format.
+    With the dispatch queue enabled, `priority` ("interactive" or "batch") orders the call
+    against other queued requests.
     """
     try:
         schema_description = """
@@ -26,7 +93,8 @@ def get_insights_from_llm(input_json: dict) -> dict:
         Only return valid JSON.
         """
 
-        prompt = (
+        with profile_stage("llm_prompt_build"):
+            prompt = (
                 "You are a Senior Business Analyst specializing in contest engagement platforms and ROI optimization. " 
                 "Carefully review the following JSON dataset, which contains contest participation, engagement, and performance analytics. "
                 "Your task is to transform this raw data into clear, actionable, and structured insights that directly improve ROI, "
@@ -55,26 +123,35 @@ def get_insights_from_llm(input_json: dict) -> dict:
             "temperature": 0.3,
         }
 
-        response = requests.post(TOGETHER_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
+        with profile_stage("llm_request"):
+            if llm_dispatch_queue is not None:
+                # Interactive calls are bounded by their request deadline, batch calls by max_wait
+                max_wait = LLM_QUEUE_BATCH_MAX_WAIT_SECONDS if priority == "batch" else None
+                result = llm_dispatch_queue.dispatch(
+                    payload, lambda: _post_to_provider(headers, payload), priority, max_wait
+                )
+            else:
+                result = _post_to_provider(headers, payload)
 
         if "choices" not in result or len(result["choices"]) == 0:
             return {}
 
         raw_output = result["choices"][0]["message"]["content"]
 
-        # ✅ First repair JSON
-        repaired = repair_json(raw_output)
+        with profile_stage("llm_parse"):
+            # ✅ First repair JSON
+            repaired = repair_json(raw_output)
 
-        # ✅ Parse repaired JSON
-        insights = json.loads(repaired)
+            # ✅ Parse repaired JSON
+            insights = json.loads(repaired)
 
         # ✅ Save to file
-        with open("insights.json", "w") as f:
+        with _insights_file_lock, open("insights.json", "w") as f:
             json.dump(insights, f, indent=2)
 
         return insights
 
+    except (DeadlineExceeded, CircuitBreakerOpen):
+        raise
     except Exception as e:
         raise RuntimeError(f"Query failed: {e}")
\ No newline at end of file
@@ -0,0 +1,370 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from app.core.logging_config import logger
+from app.core.resilience import DeadlineExceeded, current_deadline
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+WINDOW_SECONDS = 60.0
+POLL_SECONDS = 0.1
+MAX_POLL_SECONDS = 1.0
+# How often each worker looks for jobs left behind by dead processes
+ORPHAN_CHECK_SECONDS = 5.0
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+# Rough allowance for the completion on top of the prompt estimate
+COMPLETION_TOKEN_ESTIMATE = 1500
+KEEP_FINISHED_SECONDS = 600.0
+
+
+class QueueWaitTimeout(Exception):
+    pass
+
+
+# Errors that only mean this caller ran out of time; another waiter may take the job over
+GAVE_UP_ERRORS = (DeadlineExceeded, QueueWaitTimeout)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER_SECONDS))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class LLMDispatchQueue:
+    """
+    Host-wide LLM dispatch queue backed by a SQLite file.
+
+    Every gunicorn worker opens the same file, which gives all of them:
+      - deduplication: identical payloads already queued or running (or
+        finished within `dedup_ttl`) are awaited instead of re-sent;
+      - a global sliding-window budget of requests and tokens per minute;
+      - priority: while the budget is short, interactive jobs are granted
+        before batch jobs, FIFO within a priority;
+      - 429 handling: the whole queue pauses for Retry-After and the job is
+        retried instead of failing.
+
+    The request thread that enqueued a job (the leader) sends it itself once
+    granted, so no separate broker process is needed. If the leader gives up
+    on its own deadline, the job is marked abandoned and a waiting follower
+    re-enqueues it and takes over. Waiters poll with read transactions and
+    backoff; the write lock is only taken to enqueue, grant or finish.
+    """
+
+    def __init__(self, path: str, rpm_limit: int, tpm_limit: int = 0, dedup_ttl: float = 30.0):
+        self.path = path
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.dedup_ttl = dedup_ttl
+        self._last_orphan_check = 0.0
+        self._orphan_lock = threading.Lock()
+        self._init_schema()
+
+    @property
+    def pid(self) -> int:
+        # Read on every use: the queue may be created before gunicorn forks
+        return os.getpid()
+
+    # ----------------------------
+    # Storage
+    # ----------------------------
+    @contextmanager
+    def _transaction(self, write: bool = True):
+        """Write transactions take the database lock up front; reads never block on it (WAL)."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    prompt_key TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    est_tokens INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    owner_pid INTEGER NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (prompt_key, state);
+                CREATE INDEX IF NOT EXISTS jobs_by_turn ON jobs (state, priority, id);
+                CREATE TABLE IF NOT EXISTS grants (granted_at REAL NOT NULL, tokens INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS pause (id INTEGER PRIMARY KEY CHECK (id = 1), until REAL NOT NULL);
+            """)
+        finally:
+            conn.close()
+
+    # ----------------------------
+    # Dispatch
+    # ----------------------------
+    def dispatch(self, payload: dict, send, priority: str = "interactive", max_wait: float = None) -> dict:
+        """
+        Queue `payload` and return the provider response.
+
+        `send()` performs the actual HTTP call and must return the parsed
+        response; it only runs once this job is granted by the budget.
+        """
+        body = json.dumps(payload, sort_keys=True)
+        prompt_key = hashlib.sha256(body.encode()).hexdigest()
+        est_tokens = len(body) // 4 + COMPLETION_TOKEN_ESTIMATE
+        give_up_at = time.time() + max_wait if max_wait else None
+
+        while True:
+            job_id, leader, cached = self._enqueue(prompt_key, PRIORITIES.get(priority, 1), est_tokens)
+            if cached is not None:
+                logger.info("♻️ LLM response reused from a finished identical request")
+                return cached
+            if leader:
+                return self._lead(job_id, send, give_up_at)
+            logger.info("🔗 Joined in-flight identical LLM request (job %d)", job_id)
+            result = self._await_result(job_id, give_up_at)
+            if result is not None:
+                return result
+            logger.info("🔁 Leader of LLM job %d gave up, re-enqueueing", job_id)
+
+    def _lead(self, job_id: int, send, give_up_at) -> dict:
+        try:
+            while True:
+                self._wait_for_grant(job_id, give_up_at)
+                try:
+                    result = send()
+                except GAVE_UP_ERRORS:
+                    raise
+                except Exception as e:
+                    response = getattr(e, "response", None)
+                    if getattr(response, "status_code", None) == 429 and self._requeue_after_rate_limit(job_id, response):
+                        continue
+                    self._finish(job_id, "failed", error=str(e))
+                    raise
+                self._finish(job_id, "done", result=result)
+                return result
+        except BaseException as e:
+            # Out of time (or interrupted): followers with time left can take the job over
+            self._finish(job_id, "abandoned", error=str(e), only_if_unfinished=True)
+            raise
+
+    def _enqueue(self, prompt_key: str, priority: int, est_tokens: int):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, state, result FROM jobs WHERE prompt_key = ? AND "
+                "(state IN ('waiting', 'running') OR (state = 'done' AND finished_at > ?)) "
+                "ORDER BY id DESC LIMIT 1",
+                (prompt_key, now - self.dedup_ttl),
+            ).fetchone()
+            if row is not None:
+                job_id, state, result = row
+                if state == "done":
+                    return job_id, False, json.loads(result)
+                # An interactive follower promotes a queued batch job
+                conn.execute("UPDATE jobs SET priority = MIN(priority, ?) WHERE id = ?", (priority, job_id))
+                return job_id, False, None
+            cur = conn.execute(
+                "INSERT INTO jobs (prompt_key, priority, est_tokens, state, owner_pid, enqueued_at) "
+                "VALUES (?, ?, ?, 'waiting', ?, ?)",
+                (prompt_key, priority, est_tokens, self.pid, now),
+            )
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - KEEP_FINISHED_SECONDS,))
+            conn.execute("DELETE FROM grants WHERE granted_at < ?", (now - WINDOW_SECONDS,))
+            return cur.lastrowid, True, None
+
+    def _check_wait(self, give_up_at):
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check("LLM dispatch")
+        if give_up_at is not None and time.time() >= give_up_at:
+            raise QueueWaitTimeout("Timed out waiting in the LLM dispatch queue")
+
+    def _turn(self, conn, job_id: int, now: float) -> tuple:
+        """
+        Jobs queued ahead of `job_id`, and seconds until the shared budget
+        (pause, requests and tokens per minute) has room for all of them plus
+        this one. A job may start once that wait is 0, so priority order is
+        kept while the budget is short without serialising grants otherwise.
+        """
+        priority, est_tokens = conn.execute("SELECT priority, est_tokens FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        ahead, ahead_tokens = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(est_tokens), 0) FROM jobs "
+            "WHERE state = 'waiting' AND (priority < ? OR (priority = ? AND id < ?))",
+            (priority, priority, job_id),
+        ).fetchone()
+        pause = conn.execute("SELECT until FROM pause WHERE id = 1").fetchone()
+        used_requests, used_tokens, oldest_grant = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0), MIN(granted_at) FROM grants WHERE granted_at > ?",
+            (now - WINDOW_SECONDS,),
+        ).fetchone()
+
+        budget_wait = max(pause[0] - now, 0.0) if pause else 0.0
+        over_requests = self.rpm_limit and used_requests + ahead >= self.rpm_limit
+        # A single job larger than the token budget may still go first in an empty window
+        over_tokens = self.tpm_limit and (used_requests or ahead) and used_tokens + ahead_tokens + est_tokens > self.tpm_limit
+        if over_requests or over_tokens:
+            # The oldest grant leaving the window is the earliest the budget can grow
+            reopens_in = oldest_grant + WINDOW_SECONDS - now if oldest_grant else POLL_SECONDS
+            budget_wait = max(budget_wait, reopens_in, POLL_SECONDS)
+        return ahead, budget_wait
+
+    def _poll_delay(self, ahead: int, budget_wait: float, attempt: int) -> float:
+        if ahead == 0:
+            # Next in line: wake up as soon as the budget allows
+            return min(max(budget_wait, POLL_SECONDS), MAX_POLL_SECONDS)
+        # Further back: back off, the deeper in the queue the slower, with jitter so
+        # hundreds of waiters don't poll in lockstep
+        delay = min(POLL_SECONDS * 2 ** attempt, POLL_SECONDS * ahead, MAX_POLL_SECONDS)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _wait_for_grant(self, job_id: int, give_up_at):
+        attempt = 0
+        while True:
+            self._check_wait(give_up_at)
+            self._fail_orphans()
+            with self._transaction(write=False) as conn:
+                ahead, budget_wait = self._turn(conn, job_id, time.time())
+            if budget_wait == 0:
+                # Re-check under the write lock: another worker may have been granted meanwhile
+                with self._transaction() as conn:
+                    now = time.time()
+                    ahead, budget_wait = self._turn(conn, job_id, now)
+                    if budget_wait == 0:
+                        est_tokens = conn.execute("SELECT est_tokens FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+                        conn.execute("INSERT INTO grants (granted_at, tokens) VALUES (?, ?)", (now, est_tokens))
+                        conn.execute(
+                            "UPDATE jobs SET state = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                            (now, job_id),
+                        )
+                        return
+            time.sleep(self._poll_delay(ahead, budget_wait, attempt))
+            attempt += 1
+
+    def _fail_orphans(self):
+        """Abandon unfinished jobs whose owning worker process has exited, at most every ORPHAN_CHECK_SECONDS."""
+        with self._orphan_lock:
+            if time.time() - self._last_orphan_check < ORPHAN_CHECK_SECONDS:
+                return
+            self._last_orphan_check = time.time()
+        with self._transaction(write=False) as conn:
+            owners = [row[0] for row in conn.execute(
+                "SELECT DISTINCT owner_pid FROM jobs WHERE state IN ('waiting', 'running')"
+            ).fetchall()]
+        dead = [pid for pid in owners if pid != self.pid and not _pid_alive(pid)]
+        if not dead:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET state = 'abandoned', error = 'owner process exited', finished_at = ? "
+                "WHERE owner_pid = ? AND state IN ('waiting', 'running')",
+                [(time.time(), pid) for pid in dead],
+            )
+
+    def _requeue_after_rate_limit(self, job_id: int, response) -> bool:
+        pause_until = time.time() + _retry_after(response)
+        with self._transaction() as conn:
+            attempts = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if attempts > MAX_RATE_LIMIT_RETRIES:
+                return False
+            conn.execute(
+                "INSERT INTO pause (id, until) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET until = MAX(until, excluded.until)",
+                (pause_until,),
+            )
+            conn.execute("UPDATE jobs SET state = 'waiting' WHERE id = ?", (job_id,))
+        logger.warning("⏳ LLM provider rate limited, queue paused until %.1f (job %d)", pause_until, job_id)
+        return True
+
+    def _finish(self, job_id: int, state: str, result: dict = None, error: str = None, only_if_unfinished: bool = False):
+        query = "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE id = ?"
+        if only_if_unfinished:
+            query += " AND state IN ('waiting', 'running')"
+        with self._transaction() as conn:
+            conn.execute(query, (state, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+
+    def _await_result(self, job_id: int, give_up_at):
+        """
+        Wait for another caller's job. Returns None when its leader gave up
+        (abandoned), so this caller can re-enqueue and lead instead.
+        """
+        attempt = 0
+        while True:
+            self._check_wait(give_up_at)
+            self._fail_orphans()
+            with self._transaction(write=False) as conn:
+                state, result, error = conn.execute(
+                    "SELECT state, result, error FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+            if state == "done":
+                return json.loads(result)
+            if state == "abandoned":
+                return None
+            if state == "failed":
+                raise RuntimeError(f"Shared LLM request failed: {error}")
+            time.sleep(min(POLL_SECONDS * 2 ** attempt, MAX_POLL_SECONDS) * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    # ----------------------------
+    # Monitoring
+    # ----------------------------
+    def stats(self) -> dict:
+        now = time.time()
+        with self._transaction(write=False) as conn:
+            waiting = dict(conn.execute(
+                "SELECT priority, COUNT(*) FROM jobs WHERE state = 'waiting' GROUP BY priority"
+            ).fetchall())
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()[0]
+            oldest = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE state = 'waiting'").fetchone()[0]
+            avg_wait, max_wait, started = conn.execute(
+                "SELECT AVG(started_at - enqueued_at), MAX(started_at - enqueued_at), COUNT(*) "
+                "FROM jobs WHERE started_at > ?",
+                (now - KEEP_FINISHED_SECONDS,),
+            ).fetchone()
+            used_requests, used_tokens = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM grants WHERE granted_at > ?",
+                (now - WINDOW_SECONDS,),
+            ).fetchone()
+            pause = conn.execute("SELECT until FROM pause WHERE id = 1").fetchone()
+
+        names = {value: name for name, value in PRIORITIES.items()}
+        return {
+            "queue_depth": sum(waiting.values()),
+            "waiting_by_priority": {names.get(p, str(p)): n for p, n in waiting.items()},
+            "running": running,
+            "oldest_wait_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "recent_avg_wait_seconds": round(avg_wait or 0.0, 3),
+            "recent_max_wait_seconds": round(max_wait or 0.0, 3),
+            "recent_started": started,
+            "requests_last_minute": used_requests,
+            "tokens_last_minute": used_tokens,
+            "rpm_limit": self.rpm_limit,
+            "tpm_limit": self.tpm_limit,
+            "paused_for_seconds": round(max(pause[0] - now, 0.0), 3) if pause else 0.0,
+        }
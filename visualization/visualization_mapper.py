@@ -42,6 +42,86 @@ def safe_format_number(value, default="0"):
     except (TypeError, ValueError):
         return default
 
+def with_error_margins(cards, error_bounds):
+    """Attach ± error margins to metric cards, dropping the lookup key"""
+    for card in cards:
+        key = card.pop("key", None)
+        if key in error_bounds:
+            card["error_margin"] = safe_round(error_bounds[key], 2)
+    return cards
+
+def _trend_points(series, field, scale=1):
+    """Build line chart points for one field of a trend series"""
+    return [
+        {"x": item.get("bucket"), "y": safe_round(safe_get(item, [field], 0) * scale, 2)}
+        for item in series
+    ]
+
+def transform_trends_to_visualization(trends):
+    """
+    Build line charts from rollup trend series
+    Returns an empty list when there is no trend data
+    """
+    if not trends or not trends.get("overall"):
+        return []
+
+    overall = trends.get("overall", [])
+    clients = trends.get("clients", {})
+    granularity = trends.get("granularity", "day")
+    x_axis_label = "Week" if granularity == "week" else "Day"
+
+    return [
+        {
+            "type": "line_chart",
+            "title": "Views & Joins Trend",
+            "data": [
+                {"label": "Views", "points": _trend_points(overall, "views")},
+                {"label": "Joins", "points": _trend_points(overall, "joins")}
+            ],
+            "config": {
+                "x_axis_label": x_axis_label,
+                "y_axis_label": "Count",
+                "color_scheme": ["#3B82F6", "#10B981"],
+                "show_legend": True
+            }
+        },
+        {
+            "type": "line_chart",
+            "title": "Click-Through Rate Trend",
+            "data": [{"label": "CTR", "points": _trend_points(overall, "ctr", 100)}],
+            "config": {
+                "x_axis_label": x_axis_label,
+                "y_axis_label": "CTR",
+                "unit": "%",
+                "color_scheme": ["#F59E0B"]
+            }
+        },
+        {
+            "type": "line_chart",
+            "title": "Completion Rate Trend",
+            "data": [{"label": "Completion Rate", "points": _trend_points(overall, "completion_rate")}],
+            "config": {
+                "x_axis_label": x_axis_label,
+                "y_axis_label": "Completion Rate",
+                "unit": "%",
+                "color_scheme": ["#10B981"]
+            }
+        },
+        {
+            "type": "line_chart",
+            "title": "Joins Trend by Client",
+            "data": [
+                {"label": client_name, "points": _trend_points(series, "joins")}
+                for client_name, series in clients.items()
+            ],
+            "config": {
+                "x_axis_label": x_axis_label,
+                "y_axis_label": "Total Joins",
+                "show_legend": True
+            }
+        }
+    ]
+
 def transform_analytics_to_visualization(analytics_data):
     """
     Transform analytics JSON to visualization configuration
@@ -55,8 +135,12 @@ def transform_analytics_to_visualization(analytics_data):
         averages = overall_summary.get("averages", {})
         demographics = analytics_data.get("demographics", {})
         gender_dist = demographics.get("gender_distribution", [])
+        age_dist = demographics.get("age_distribution", [])
+        gender_age = demographics.get("gender_age_joins", [])
         reward_status = demographics.get("reward_status_distribution", [])
         client_analysis = analytics_data.get("client_analysis", [])
+        approximation = analytics_data.get("approximation")
+        error_bounds = approximation.get("error_bounds", {}) if approximation else {}
         
         # Generate timestamp
         current_time = datetime.now().isoformat() + "Z"
@@ -91,6 +175,33 @@ def transform_analytics_to_visualization(analytics_data):
         if not gender_data:
             gender_data = [{"label": "No Data", "value": 0, "percentage": 0}]
         
+        # Process age distribution safely
+        age_data = []
+        for item in age_dist:
+            age_group = item.get("Age_Breakdown")
+            age_data.append({
+                "x": str(age_group) if age_group else "Unknown",
+                "y": safe_get(item, ["Total_Joins"], 0),
+                "percentage": safe_round(safe_get(item, ["percentage"], 0), 1)
+            })
+
+        # If no age data, create default
+        if not age_data:
+            age_data = [{"x": "No Data", "y": 0, "percentage": 0}]
+
+        # Process age group x gender cross-tab safely (one row per age group)
+        age_gender_rows = {}
+        for item in gender_age:
+            age_group = item.get("Age_Breakdown")
+            gender = item.get("Gender")
+            row = age_gender_rows.setdefault(str(age_group) if age_group else "Unknown", {})
+            row[gender.title() if gender else "Unknown"] = safe_get(item, ["Total_Joins"], 0)
+        age_gender_data = [{"x": age_group, **joins} for age_group, joins in age_gender_rows.items()]
+
+        # If no cross-tab data, create default
+        if not age_gender_data:
+            age_gender_data = [{"x": "No Data"}]
+
         # Process reward status safely
         reward_data = []
         for item in reward_status:
@@ -170,13 +281,13 @@ def transform_analytics_to_visualization(analytics_data):
                     {
                         "type": "metric_cards",
                         "title": "Key Performance Metrics",
-                        "data": [
-                            {"label": "Total Views", "value": total_views, "color": "blue"},
-                            {"label": "Total Joins", "value": total_joins, "color": "green"},
-                            {"label": "Total Clicks", "value": total_clicks, "color": "orange"},
-                            {"label": "Total Winners", "value": total_winners, "color": "purple"},
-                            {"label": "Total Contests", "value": total_contests, "color": "red"}
-                        ],
+                        "data": with_error_margins([
+                            {"label": "Total Views", "value": total_views, "color": "blue", "key": "total_views"},
+                            {"label": "Total Joins", "value": total_joins, "color": "green", "key": "total_joins"},
+                            {"label": "Total Clicks", "value": total_clicks, "color": "orange", "key": "total_clicks"},
+                            {"label": "Total Winners", "value": total_winners, "color": "purple", "key": "total_winners"},
+                            {"label": "Total Contests", "value": total_contests, "color": "red", "key": "total_contests"}
+                        ], error_bounds),
                         "config": {
                             "layout": "grid",
                             "columns": 5
@@ -195,7 +306,33 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 3. Reward Status Distribution
+                    # 3. Age Distribution
+                    {
+                        "type": "bar_chart",
+                        "title": "Participants by Age Group",
+                        "data": age_data,
+                        "config": {
+                            "x_axis_label": "Age Group",
+                            "y_axis_label": "Total Joins",
+                            "color_scheme": "purple",
+                            "orientation": "vertical"
+                        }
+                    },
+
+                    # 4. Joins by Age Group and Gender
+                    {
+                        "type": "stacked_bar_chart",
+                        "title": "Joins by Age Group and Gender",
+                        "data": age_gender_data,
+                        "config": {
+                            "x_axis_label": "Age Group",
+                            "y_axis_label": "Total Joins",
+                            "color_scheme": ["#3B82F6", "#EF4444", "#10B981"],
+                            "show_legend": True
+                        }
+                    },
+
+                    # 5. Reward Status Distribution
                     {
                         "type": "doughnut_chart",
                         "title": "Reward Status Distribution",
@@ -207,7 +344,7 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 4. Client Performance Bar Chart
+                    # 6. Client Performance Bar Chart
                     {
                         "type": "bar_chart",
                         "title": "Client Views Comparison",
@@ -220,7 +357,7 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 5. Client Joins Performance
+                    # 7. Client Joins Performance
                     {
                         "type": "horizontal_bar_chart",
                         "title": "Client Joins Distribution",
@@ -232,7 +369,7 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 6. Average Metrics Gauge Charts
+                    # 8. Average Metrics Gauge Charts
                     {
                         "type": "gauge_chart",
                         "title": "Average Completion Rate",
@@ -248,7 +385,7 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 7. CTR Gauge
+                    # 9. CTR Gauge
                     {
                         "type": "gauge_chart",
                         "title": "Average Click-Through Rate",
@@ -260,7 +397,7 @@ def transform_analytics_to_visualization(analytics_data):
                         }
                     },
                     
-                    # 8. Client Analysis Table
+                    # 10. Client Analysis Table
                     {
                         "type": "table",
                         "title": "Detailed Client Analysis",
@@ -294,10 +431,20 @@ def transform_analytics_to_visualization(analytics_data):
                 "generated_at": current_time,
                 "version": "1.0",
                 "data_source": "analytics_engine",
-                "chart_count": 8,
+                "chart_count": 10,
                 "processing_method": "static_mapping"
             }
         }
+
+        # Trend line charts from time-bucketed rollups, when available
+        trend_charts = transform_trends_to_visualization(analytics_data.get("trends"))
+        if trend_charts:
+            visualization_config["visualization_data"]["charts"].extend(trend_charts)
+            visualization_config["metadata"]["chart_count"] += len(trend_charts)
+
+        # Approximate mode: expose sampling details and error bounds
+        if approximation:
+            visualization_config["metadata"]["approximation"] = approximation
         
         return visualization_config
         